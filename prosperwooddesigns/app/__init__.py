@@ -4,22 +4,37 @@
 # App Factory Pattern implementation of create_app
 # ------------------------------------------------
 
-from flask import Flask
+from flask import Flask, url_for
 
 from flask_bcrypt import Bcrypt
 from flask_wtf.csrf import CSRFProtect
 
-from .extensions import DbConnector, Logger, MockData, S3Connecter
-from .models import db, loginManager
+from .commands import Commands
+from .extensions import (DbConnector, Freezer, IntakeQueue, Logger,
+                         MockData, QueryDebugger, RequestProfiler, S3Connecter,
+                         ImagePlaceholders, Scheduler, StartupState,
+                         TemplateCache)
+from .jobs import Jobs
+from .models import db, loginManager, upgradeSchema
 from .routes import Routes
 
 csrf = CSRFProtect()
 flask_bcrypt = Bcrypt()
 routes = Routes()
+commands = Commands()
+jobs = Jobs()
 logger = Logger()
 s3Conn = S3Connecter()
 dbConn = DbConnector()
 mockData = MockData()
+queryDebugger = QueryDebugger()
+requestProfiler = RequestProfiler()
+intakeQueue = IntakeQueue()
+startupState = StartupState()
+templateCache = TemplateCache()
+imagePlaceholders = ImagePlaceholders()
+scheduler = Scheduler()
+freezer = Freezer()
 
 
 def create_app():
@@ -47,25 +62,89 @@ def create_app():
 
     with app.app_context():
         logger.log('Creating App')
+        startupState.set('configuring')
 
-        if app.config['AWS_DOWNLOAD_IMAGES']:
-            # by default, will only download images on startup
+        if app.config['DB_QUERY_DEBUG']:
+            # by default, will only count queries per request
+            # if in development
+            logger.log('Initializing query debugger')
+            queryDebugger.init_app(app)
+
+        logger.log('Initializing db unit of work')
+        dbConn.init_app(app)
+
+        if app.config['PROFILER_ENABLED']:
+            # requests are only profiled when a logged-in admin
+            # passes ?profile or the X-Profile header
+            logger.log('Initializing request profiler')
+            requestProfiler.init_app(app)
+
+        if app.config['IMAGE_SERVING'] == 's3':
+            # images are loaded by the browser straight from S3 or the
+            # CDN, so nothing needs to be downloaded
+            logger.log('Serving images from S3')
+
+        if app.config['TEMPLATE_BYTECODE_CACHE']:
+            # by default, will only cache compiled templates
             # if in production
-            s3Conn.downloadImages()
+            logger.log('Initializing template bytecode cache')
+            templateCache.init_app(app)
+
+        @app.template_global()
+        def image_url(filename):
+            '''
+            Resolves an image filename to the url it is served from
+            '''
+            if app.config['IMAGE_SERVING'] == 's3':
+                return s3Conn.getImageUrl(
+                    filename, expiry=app.config['AWS_IMAGE_URL_EXPIRY'])
+            return url_for('static', filename=f'images/{filename}')
+
+        @app.template_global()
+        def image_placeholder(filename):
+            '''
+            Returns (placeholder, width, height) of an image
+            '''
+            return imagePlaceholders.get(filename)
 
         logger.log('Importing routes')
         routes.init(app)
+        logger.log('Importing cli commands')
+        commands.init(app)
         logger.log('Initializing csrf protection')
         csrf.init_app(app)
+        # json intake only accepts application/json, which cross-site
+        # forms cannot send
+        csrf.exempt(app.view_functions['api_requestform'])
+        csrf.exempt(app.view_functions['api_contact'])
         logger.log('Initializing encryption')
         flask_bcrypt.init_app(app)
+        startupState.set('creating tables')
         logger.log('Creating all tables in db')
         db.create_all()
         db.session.commit()
+        logger.log('Upgrading db schema')
+        upgradeSchema()
+        if app.config['INTAKE_QUEUE_ENABLED']:
+            logger.log('Initializing intake queue')
+            intakeQueue.init_app(app)
+        if app.config['FREEZE_ENABLED']:
+            # by default, will only keep frozen public pages
+            # if in production
+            logger.log('Initializing page freezer')
+            freezer.init_app(app)
+        logger.log('Registering scheduled jobs')
+        jobs.init(app, scheduler)
+        if app.config['SCHEDULER_ENABLED']:
+            # every worker schedules, but each job runs on only one
+            logger.log('Initializing scheduler')
+            scheduler.init_app(app)
+
         logger.log('Initializing login manager')
         loginManager.init_app(app)
         loginManager.login_view = 'admin_login'
 
+        startupState.set('loading data')
         if app.config['GENERATE_FAKE_DATA']:
             # by default, fake data will only be generated
             # if in development and no data currently exists
@@ -94,5 +173,10 @@ def create_app():
                 logger.log('Creating generic admin user')
                 dbConn.setAdmin(username, password, firstname, lastname)
 
+        if app.config['TEMPLATE_BYTECODE_CACHE']:
+            logger.log('Warming up templates')
+            templateCache.warm(app)
+
+        startupState.set('started')
         logger.log('App created')
         return app
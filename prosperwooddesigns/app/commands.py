@@ -0,0 +1,225 @@
+# commands.py
+# Michael Cole
+#
+# Location of all flask cli commands
+# ----------------------------------
+
+import json
+
+import click
+
+from .extensions import DbConnector, Helper, LogArchive, Logger, MockData
+
+logger = Logger()
+helper = Helper()
+logArchive = LogArchive()
+mockData = MockData()
+dbConn = DbConnector()
+
+
+class Commands:
+    '''
+    Commands object initializes a Flask app object in order to define all
+    available cli commands
+
+    Use:
+        commands = Commands()
+        commands.init(app)
+    '''
+
+    def init(self, app):
+        '''
+        Initializes a Flask app object with all available cli commands
+        '''
+
+        @app.cli.command('seed')
+        @click.option('--table', 'tables', multiple=True,
+                      type=click.Choice(['admin', 'request', 'image',
+                                         'layout', 'contact']),
+                      help='Table to seed. Seeds requests and contacts '
+                           'by default')
+        @click.option('--rows', default=10000, help='Rows per table')
+        @click.option('--batch-size', default=5000, help='Rows per insert')
+        @click.option('--processes', default=1,
+                      help='Processes generating fake rows')
+        @click.option('--fast-hash', is_flag=True,
+                      help='Use a low-cost hash for fake admin passwords')
+        def seed(tables, rows, batch_size, processes, fast_hash):
+            '''
+            Bulk loads the database with fake data
+            '''
+            from .models import db
+
+            for table in tables or ('request', 'contact'):
+                logger.log(f'Seeding {rows} {table} rows')
+                mockData.bulkLoad(db, table, rows, batch_size=batch_size,
+                                  processes=processes, fast_hash=fast_hash)
+
+        @app.cli.command('archive')
+        @click.option('--days', default=None, type=int,
+                      help='Archive rows created more than this many days '
+                           'ago. Defaults to ARCHIVE_AFTER_DAYS')
+        def archive(days):
+            '''
+            Moves old completed or deleted requests and read contacts into
+            the archive tables
+            '''
+            dbConn.archive(days or app.config['ARCHIVE_AFTER_DAYS'])
+
+        @app.cli.command('compile-templates')
+        def compile_templates():
+            '''
+            Precompiles every template into the shared bytecode cache
+            '''
+            from . import templateCache
+
+            if not app.config['TEMPLATE_BYTECODE_CACHE']:
+                logger.log('Template bytecode cache is disabled')
+                return
+            count = templateCache.warm(app)
+            logger.log(f'Compiled {count} templates')
+
+        @app.cli.command('sync-images')
+        def sync_images():
+            '''
+            Downloads all images from S3 and computes their placeholders.
+            Run before the server starts, so workers never serve pages
+            whose images are missing
+            '''
+            from . import s3Conn, startupState
+
+            if app.config['IMAGE_SERVING'] == 's3':
+                logger.log('Images are served from S3, nothing to sync')
+                return
+            try:
+                startupState.syncImages(s3Conn)
+            except Exception as e:
+                # the site still starts, with whatever images it has
+                logger.log(f'Image sync failed - {e}')
+
+        @app.cli.command('image-placeholders')
+        @click.option('--force', is_flag=True,
+                      help='Recompute placeholders that already exist')
+        def image_placeholders(force):
+            '''
+            Computes the inline placeholders of the local photos
+            '''
+            from . import imagePlaceholders
+
+            count = imagePlaceholders.ingest(
+                app.config['AWS_LOCAL_IMAGE_PATH'], force=force)
+            logger.log(f'Computed {count} image placeholders')
+
+        @app.cli.command('rotate-logs')
+        def rotate_logs():
+            '''
+            Compresses and indexes the log files of previous days
+            '''
+            count = logArchive.rotate()
+            logger.log(f'Compressed {count} log files')
+
+        @app.cli.command('logs')
+        @click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']),
+                      help='First day to read. Defaults to today')
+        @click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']),
+                      help='Last day to read. Defaults to today')
+        @click.option('--since', default=0, type=click.IntRange(0, 23),
+                      help='First hour of each day to read')
+        @click.option('--until', default=23, type=click.IntRange(0, 23),
+                      help='Last hour of each day to read')
+        @click.option('--type', 'type_',
+                      help='Only read messages starting with this word, '
+                           'e.g. Created')
+        @click.option('--match', help='Only read lines containing this text')
+        @click.option('--counts', is_flag=True,
+                      help='Print the message type counts of each '
+                           'compressed day instead of lines')
+        def logs(start, end, since, until, type_, match, counts):
+            '''
+            Streams the log lines between two days, reading compressed
+            days through their index
+            '''
+            today = helper.getTime_tz().date()
+            start = start.date() if start else today
+            end = end.date() if end else today
+
+            if counts:
+                for day, types in logArchive.getCounts(start, end).items():
+                    click.echo(f'{day} {json.dumps(types, sort_keys=True)}')
+                return
+            for line in logArchive.read(start, end, since, until, type_,
+                                        match):
+                click.echo(line, nl=False)
+
+        @app.cli.command('jobs')
+        @click.option('--name', help='Only show the runs of this job')
+        @click.option('--limit', default=20, help='Number of runs to show')
+        def jobs(name, limit):
+            '''
+            Lists the scheduled jobs and their most recent runs
+            '''
+            from . import scheduler
+
+            for jobName, (schedule, func, scope) in scheduler.jobs.items():
+                click.echo(f'{jobName:<20} {schedule.expression:<16} {scope}')
+            click.echo()
+            for run in scheduler.getRuns(name, limit):
+                duration = '' if run.duration_ms is None \
+                    else f'{run.duration_ms}ms'
+                click.echo(f'{run.started_at:%Y-%m-%d %H:%M:%S} '
+                           f'{run.name:<20} {run.status:<10} {duration:>10} '
+                           f'{run.worker}')
+
+        @app.cli.command('run-job')
+        @click.argument('name')
+        def run_job(name):
+            '''
+            Runs a scheduled job now, unless it is already running
+            '''
+            from . import scheduler
+            from .extensions import clock
+
+            if name not in scheduler.jobs:
+                raise click.BadParameter(f'Unknown job {name}')
+            minute = clock.now().replace(second=0, microsecond=0)
+            if scheduler.runJob(name, minute) is None:
+                logger.log(f'Job {name} is running or already ran this '
+                           f'minute')
+
+        @app.cli.command('freeze')
+        @click.option('--if-changed', is_flag=True,
+                      help='Only freeze if the Image or Layout rows have '
+                           'changed since the last freeze')
+        def freeze(if_changed):
+            '''
+            Pre-renders the public pages into static html for nginx
+            '''
+            from . import freezer
+
+            if not app.config['FREEZE_ENABLED']:
+                logger.log('Page freezer is disabled')
+                return
+            freezer.freeze(ifChanged=if_changed)
+
+        @app.cli.command('rollup-backfill')
+        def rollup_backfill():
+            '''
+            Rebuilds the dashboard rollups from the request and contact
+            tables
+            '''
+            dbConn.rollups.backfill()
+
+        @app.cli.command('intake-dead-letters')
+        def intake_dead_letters():
+            '''
+            Lists the queued submissions Postgres rejected, with the error
+            '''
+            from . import intakeQueue
+
+            if not app.config['INTAKE_QUEUE_ENABLED']:
+                logger.log('Intake queue is disabled')
+                return
+            for id, kind, payload, error in \
+                    intakeQueue.getDeadSubmissions():
+                click.echo(f'{id} {kind} {error}')
+                click.echo(f'    {json.dumps(payload, sort_keys=True)}')
@@ -6,15 +6,95 @@
 
 import os
 import sys
-from datetime import datetime
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-from flask import current_app
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from backports.zoneinfo import ZoneInfo
 
-import boto3
+from flask import current_app, g, has_request_context, request
+
+
+class Clock:
+    '''
+    Timezone-aware clock shared by the app. Timezone objects and date
+    formatting are cached, and the clock can be frozen in tests
+
+    Use:
+        clock = Clock()
+        clock.now()
+        clock.freeze(datetime(2020, 1, 1, 12, tzinfo=timezone.utc))
+    '''
+
+    def __init__(self, tz='America/Chicago'):
+        self.tz = tz
+        self.frozen = None
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def getZone(tz):
+        '''
+        Returns the cached timezone object for a timezone name
+        '''
+        return ZoneInfo(tz)
+
+    def now(self, tz=None):
+        '''
+        Returns the current time in the given timezone, or the clock's
+        default timezone
+        '''
+        zone = self.getZone(tz or self.tz)
+        if self.frozen is not None:
+            return self.frozen.astimezone(zone)
+        return datetime.now(zone)
+
+    def freeze(self, now):
+        '''
+        Stops the clock at an aware datetime until unfreeze is called
+        '''
+        self.frozen = now
+
+    def unfreeze(self):
+        self.frozen = None
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def getDateParts(day):
+        '''
+        Returns zero-padded (year, month, day) strings for a date
+        '''
+        return day.strftime('%Y'), day.strftime('%m'), day.strftime('%d')
+
+
+clock = Clock()
+
+
+def offload(func, *args, **kwargs):
+    '''
+    Runs blocking work that never yields to gevent (SQLite, image
+    decoding, compressing files) on a real thread of gevent's threadpool
+    when serving with gevent workers, so that only the calling greenlet
+    waits instead of every connection on the worker. Otherwise simply
+    calls the function. The function runs outside of any app context
+    '''
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return func(*args, **kwargs)
+    if not monkey.is_module_patched('socket'):
+        return func(*args, **kwargs)
+    return get_hub().threadpool.apply(func, args, kwargs)
 
 
 class Helper:
 
+    def __init__(self, clock=clock):
+        self.clock = clock
+
     def getGreeting(self):
         ct_now = self.getTime_tz()
         hour = ct_now.time().hour
@@ -29,11 +109,7 @@ class Helper:
             return 'It is very late'
 
     def getTime_tz(self, tz='America/Chicago'):
-        from datetime import datetime
-        import pytz
-
-        utc_now = pytz.utc.localize(datetime.now())
-        return utc_now.astimezone(pytz.timezone(tz))
+        return self.clock.now(tz)
 
 
 class Logger:
@@ -43,6 +119,11 @@ class Logger:
     '''
 
     helper = Helper()
+    directory = '/prosperwooddesigns/logs'
+    # log directories already known to exist
+    fileprefixes = set()
+    # daily log files already written to by this process
+    filenames = set()
 
     def log(self, string):
         '''
@@ -54,30 +135,622 @@ class Logger:
 
         if current_app.config['LOG_TO_FILE']:
             now = self.helper.getTime_tz()
-            year = str(now.year).rjust(4, '0')
-            month = str(now.month).rjust(2, '0')
-            day = str(now.day).rjust(2, '0')
-            hour = str(now.hour).rjust(2, '0')
-            minute = str(now.minute).rjust(2, '0')
-            second = str(now.second).rjust(2, '0')
+            year, month, day = self.helper.clock.getDateParts(now.date())
 
-            fileprefix = f'/prosperwooddesigns/logs/{year}/{month}'
-            if not os.path.exists(fileprefix):
-                os.makedirs(fileprefix)
+            fileprefix = f'{self.directory}/{year}/{month}'
+            if fileprefix not in self.fileprefixes:
+                os.makedirs(fileprefix, exist_ok=True)
+                self.fileprefixes.add(fileprefix)
 
             filename = f'{fileprefix}/log_{year}{month}{day}.log'
-            timestamp = f'{hour}:{minute}:{second}'
+            timestamp = now.strftime('%H:%M:%S')
+
+            # a new day has started, so earlier days' files are closed.
+            # Rotating inline (once per process a day) rather than in a
+            # thread means an exiting process never leaves a half-written
+            # archive behind
+            if filename not in self.filenames:
+                self.filenames.add(filename)
+                if current_app.config['LOG_COMPRESS']:
+                    offload(LogArchive(self.directory).rotate, now.date())
 
             with open(filename, 'a+') as f:
                 print(f'>> [{timestamp}] {string}', file=f, flush=True)
 
 
+class LogArchive:
+    '''
+    Compressed archive of the daily log files. Once a day is over its file
+    is gzipped with one gzip member per hour, alongside a sidecar index
+    holding the offset of each hour's member and the count of each message
+    type (the first word of a message, e.g. `Created`). Reads seek straight
+    to the hours they need and skip days without the type asked for, and
+    decompress as they stream rather than to disk
+
+    Use:
+        logArchive = LogArchive()
+        logArchive.rotate()
+        for line in logArchive.read(date(2020, 8, 1), date(2020, 8, 7),
+                                    since=9, until=17, type='Created'):
+            print(line, end='')
+    '''
+
+    def __init__(self, directory=None):
+        self.directory = directory or Logger.directory
+
+    def getPath(self, day, extension='log'):
+        '''
+        Returns the path of a day's log file, compressed log ('log.gz') or
+        index ('idx.json')
+        '''
+        year, month, dayOfMonth = clock.getDateParts(day)
+        return (f'{self.directory}/{year}/{month}/'
+                f'log_{year}{month}{dayOfMonth}.{extension}')
+
+    @staticmethod
+    def tagLines(lines):
+        '''
+        Yields (hour, message type, line) for lines formatted as
+        `>> [HH:MM:SS] message`. Lines continuing a multi-line message
+        take the hour of the message and a type of None
+        '''
+        hour = 0
+        for line in lines:
+            type = None
+            if line.startswith('>> [') and line[12:14] == '] ':
+                hour = int(line[4:6])
+                type = (line[14:].split(maxsplit=1) or [''])[0]
+            yield hour, type, line
+
+    def readIndex(self, day):
+        '''
+        Returns a day's index, or None when the day is not compressed
+        '''
+        import json
+
+        try:
+            with open(self.getPath(day, 'idx.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def lock(path):
+        '''
+        Opens a file in binary and takes an exclusive lock on it without
+        waiting
+
+        Returns:
+            The open file, or None if it is missing, locked by another
+            process, or was renamed or removed before it was locked
+        '''
+        import fcntl
+
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        f.close()
+        return None
+
+    def compress(self, day):
+        '''
+        Compresses a closed day's log file and indexes it. Lines written
+        after an earlier compression are appended as new members. A file
+        is claimed by locking it and renaming it to `.rotating`, and the
+        lock is held until it is compressed, so a claimed file that is
+        not locked was left by a process that died and is finished here.
+        Lines the dead process had already appended are skipped
+
+        Returns:
+            True if anything was compressed, False if another process is
+            compressing the day or there was nothing to compress
+        '''
+        path = self.getPath(day)
+        claimed = f'{path}.rotating'
+        compressed = False
+
+        # finish an abandoned claim first, so the next claim never
+        # renames a file over it
+        if os.path.exists(claimed):
+            source = self.lock(claimed)
+            if source is None:
+                return False
+            with source:
+                self.append(day, source)
+                os.remove(claimed)
+            compressed = True
+
+        source = self.lock(path)
+        if source is not None:
+            with source:
+                os.rename(path, claimed)
+                self.append(day, source)
+                os.remove(claimed)
+            compressed = True
+        return compressed
+
+    @staticmethod
+    def getClaim(source):
+        '''
+        Identifies a claimed file by its inode and modification time,
+        which renaming it keeps
+        '''
+        stat = os.fstat(source.fileno())
+        return [stat.st_ino, stat.st_mtime_ns]
+
+    def append(self, day, source):
+        '''
+        Appends the lines of a claimed log file, opened in binary, to a
+        day's compressed log, one gzip member per hour, and updates the
+        day's index. The index records how far into the claimed file it
+        has appended, so a claim finished after a crash skips those lines
+        '''
+        import gzip
+        import json
+        from itertools import groupby
+        from operator import itemgetter
+
+        index = self.readIndex(day) or {'members': [], 'types': {},
+                                        'lines': 0}
+        claim = self.getClaim(source)
+        if index.get('claim', [])[:2] == claim:
+            source.seek(index['claim'][2])
+        end = max((offset + length
+                   for hour, offset, length in index['members']), default=0)
+        types = Counter(index['types'])
+        with open(self.getPath(day, 'log.gz'), 'ab') as target:
+            # drop members written by a process that died before it
+            # could index them
+            target.truncate(end)
+            target.seek(end)
+            decoded = (line.decode() for line in source)
+            for hour, lines in groupby(self.tagLines(decoded),
+                                       key=itemgetter(0)):
+                offset = target.tell()
+                with gzip.GzipFile(fileobj=target, mode='wb') as member:
+                    for _, type, line in lines:
+                        member.write(line.encode())
+                        index['lines'] += 1
+                        if type is not None:
+                            types[type] += 1
+                index['members'].append(
+                    [hour, offset, target.tell() - offset])
+        index['types'] = dict(types)
+        index['claim'] = claim + [source.tell()]
+
+        indexPath = self.getPath(day, 'idx.json')
+        with open(f'{indexPath}.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(f'{indexPath}.tmp', indexPath)
+
+    def rotate(self, before=None):
+        '''
+        Compresses every log file from before a date, today by default,
+        along with any `.rotating` file a dead process left behind
+
+        Returns:
+            Number of days compressed
+        '''
+        before = before or clock.now().date()
+        days = set()
+        for root, dirs, files in os.walk(self.directory):
+            for filename in files:
+                if filename.startswith('log_') and \
+                        filename.endswith(('.log', '.log.rotating')):
+                    days.add(
+                        datetime.strptime(filename[4:12], '%Y%m%d').date())
+
+        count = 0
+        for day in sorted(days):
+            if day < before and self.compress(day):
+                count += 1
+        return count
+
+    def readCompressed(self, day, index, since, until):
+        '''
+        Streams the lines of a compressed day's members within the hours
+        '''
+        import gzip
+        import io
+
+        with open(self.getPath(day, 'log.gz'), 'rb') as f:
+            for hour, offset, length in index['members']:
+                if not since <= hour <= until:
+                    continue
+                f.seek(offset)
+                member = gzip.GzipFile(fileobj=io.BytesIO(f.read(length)))
+                yield from io.TextIOWrapper(member)
+
+    def readPlain(self, day, index=None):
+        '''
+        Streams the lines of a day's uncompressed log files, including
+        the part of one claimed for compression not yet compressed
+        '''
+        for path in (f'{self.getPath(day)}.rotating', self.getPath(day)):
+            try:
+                with open(path, 'rb') as f:
+                    if index and index.get('claim', [])[:2] == \
+                            self.getClaim(f):
+                        f.seek(index['claim'][2])
+                    for line in f:
+                        yield line.decode()
+            except FileNotFoundError:
+                continue
+
+    def readDay(self, day, since=0, until=23, type=None, match=None):
+        '''
+        Streams a day's log lines within the hours, of a message type
+        and containing some text
+        '''
+        from itertools import chain
+
+        index = self.readIndex(day)
+        plain = os.path.exists(self.getPath(day)) or \
+            os.path.exists(f'{self.getPath(day)}.rotating')
+        if index is None and not plain:
+            return
+        if type and index is not None and not plain \
+                and not index['types'].get(type):
+            return
+
+        lines = self.readPlain(day, index)
+        if index is not None:
+            lines = chain(self.readCompressed(day, index, since, until), lines)
+
+        keep = False
+        for hour, lineType, line in self.tagLines(lines):
+            if lineType is not None:
+                keep = since <= hour <= until and \
+                    (not type or lineType == type)
+            if keep and (not match or match in line):
+                yield line
+
+    def read(self, start, end, since=0, until=23, type=None, match=None):
+        '''
+        Streams the log lines of every day from start to end, oldest first
+        '''
+        day = start
+        while day <= end:
+            yield from self.readDay(day, since, until, type, match)
+            day += timedelta(days=1)
+
+    def getCounts(self, start, end):
+        '''
+        Returns each compressed day's message type counts from its index
+        '''
+        counts = {}
+        day = start
+        while day <= end:
+            index = self.readIndex(day)
+            if index is not None:
+                counts[day] = index['types']
+            day += timedelta(days=1)
+        return counts
+
+
+class Rollups:
+    '''
+    Daily aggregates of request and contact activity, maintained as rows
+    are written so that dashboard analytics cost O(days) rather than
+    O(rows). Each row counts one metric for one table on one day:
+
+        created             rows created that day
+        status              rows moved into a status (bucket) that day
+        completion_days     requests completed that day, bucketed by
+                            days since they were created
+
+    Use:
+        rollups = Rollups()
+        rollups.recordCreated('request', created_date, 'unread')
+    '''
+
+    def __init__(self):
+        from .models import db
+        self.db = db
+        self.logger = Logger()
+
+    def increment(self, day, table, metric, bucket='', count=1):
+        '''
+        Adds `count` to a rollup row, creating it if needed, inside the
+        caller's transaction
+        '''
+        if not current_app.config['ROLLUPS_ENABLED']:
+            return
+        from sqlalchemy.dialects.postgresql import insert
+        from .models import DailyRollup
+
+        if isinstance(day, datetime):
+            day = day.date()
+        statement = insert(DailyRollup).values(
+            day=day, table=table, metric=metric, bucket=bucket, count=count
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['day', 'table', 'metric', 'bucket'],
+            set_={'count': DailyRollup.count + statement.excluded.count}
+        )
+        self.db.session.execute(statement)
+
+    def recordCreated(self, table, created_date, status):
+        self.increment(created_date, table, 'created')
+        self.increment(created_date, table, 'status', status)
+
+    def recordStatusChange(self, table, old, new, created_date):
+        if old == new:
+            return
+        today = clock.now().date()
+        self.increment(today, table, 'status', new)
+        if new == 'complete':
+            if isinstance(created_date, datetime):
+                created_date = created_date.date()
+            days = (today - created_date).days
+            self.increment(today, table, 'completion_days', str(days))
+
+    def backfill(self):
+        '''
+        Rebuilds the rollups from the request and contact tables. Status
+        history is not stored, so each row counts towards its current
+        status on its created date, and completion times cannot be
+        recovered
+        '''
+        self.db.session.execute('DELETE FROM daily_rollup')
+        for table in ('request', 'contact'):
+            self.db.session.execute(
+                f"INSERT INTO daily_rollup (day, \"table\", metric, bucket, "
+                f"count) SELECT created_date, '{table}', 'created', '', "
+                f"count(*) FROM {table} GROUP BY created_date"
+            )
+            self.db.session.execute(
+                f"INSERT INTO daily_rollup (day, \"table\", metric, bucket, "
+                f"count) SELECT created_date, '{table}', 'status', status, "
+                f"count(*) FROM {table} GROUP BY created_date, status"
+            )
+        self.db.session.commit()
+        self.logger.log('Backfilled rollups')
+
+    def getDashboard(self, table='request', weeks=12):
+        '''
+        Returns rows created per week for the last `weeks` weeks, the
+        status funnel and the median days to completion, reading only the
+        rollup table
+        '''
+        from .models import DailyRollup
+
+        rows = DailyRollup.query.filter_by(table=table).all()
+        since = clock.now().date() - timedelta(weeks=weeks)
+
+        perWeek = {}
+        funnel = {}
+        completions = []
+        for row in rows:
+            if row.metric == 'created' and row.day >= since:
+                week = row.day - timedelta(days=row.day.weekday())
+                perWeek[week] = perWeek.get(week, 0) + row.count
+            elif row.metric == 'status':
+                funnel[row.bucket] = funnel.get(row.bucket, 0) + row.count
+            elif row.metric == 'completion_days':
+                completions.append((int(row.bucket), row.count))
+
+        return {
+            'per_week': [{'week': week.isoformat(), 'count': count}
+                         for week, count in sorted(perWeek.items())],
+            'funnel': funnel,
+            'median_completion_days': self.median(completions),
+        }
+
+    def median(self, histogram):
+        '''
+        Median of a histogram given as a list of (value, count)
+        '''
+        total = sum(count for value, count in histogram)
+        if not total:
+            return None
+        seen = 0
+        for value, count in sorted(histogram):
+            seen += count
+            if seen * 2 >= total:
+                return value
+
+
 class DbConnector:
 
     def __init__(self):
         from .models import db
         self.db = db
         self.logger = Logger()
+        self.rollups = Rollups()
+
+    def init_app(self, app):
+        '''
+        Makes every request a single unit of work: changes made through
+        the set and update methods are flushed as they happen and
+        committed once, after the view returns
+        '''
+        app.after_request(self._commitRequest)
+
+    def _commitRequest(self, response):
+        if g.pop('dbPending', False):
+            self.db.session.commit()
+        return response
+
+    def save(self, commit=None):
+        '''
+        Commits pending changes. By default, changes made during a
+        request are flushed and left for the request's single commit,
+        while changes made outside of a request are committed right away.
+        Pass commit=False to leave the changes pending for the caller
+        '''
+        if commit is False:
+            return
+        if commit is None and has_request_context() and \
+                current_app.config['DB_UNIT_OF_WORK']:
+            self.db.session.flush()
+            g.dbPending = True
+        else:
+            self.db.session.commit()
+
+    def getModel(self, table):
+        '''
+        Returns the model for a table name such as 'request'
+        '''
+        from .models import Admin, Contact, Image, Layout, Request
+        return {
+            'admin': Admin,
+            'request': Request,
+            'image': Image,
+            'layout': Layout,
+            'contact': Contact,
+        }[table]
+
+    def getColumns(self, table):
+        '''
+        Returns the displayable columns of a table, leaving out internal
+        columns such as search_vector
+        '''
+        model = self.getModel(table)
+        return [column for column in model.__table__.columns
+                if column.key != 'search_vector']
+
+    def excludeDeleted(self, model, query, include_deleted=False):
+        '''
+        Filters soft-deleted rows out of a query on tables that support
+        soft deletes
+        '''
+        if include_deleted or not hasattr(model, 'is_deleted'):
+            return query
+        # written as NOT is_deleted so that the planner can match the
+        # partial index ix_request_live_created_date
+        return query.filter(~model.is_deleted)
+
+    def count(self, table, include_deleted=False, **filters):
+        '''
+        Counts the rows of a table matching the given column filters
+        '''
+        from sqlalchemy import func
+        model = self.getModel(table)
+        query = self.db.session.query(func.count(model.id)) \
+            .filter_by(**filters)
+        query = self.excludeDeleted(model, query, include_deleted)
+        return query.scalar()
+
+    def exists(self, table, offset=0, include_deleted=False, **filters):
+        '''
+        Checks if a table has more than `offset` rows matching the given
+        column filters without counting all of them
+        '''
+        model = self.getModel(table)
+        query = self.db.session.query(model.id).filter_by(**filters)
+        query = self.excludeDeleted(model, query, include_deleted)
+        return query.offset(offset).limit(1).first() is not None
+
+    def getStatusCounts(self, table, include_deleted=False):
+        '''
+        Returns a dictionary of status to number of rows for the request
+        or contact table
+        '''
+        from sqlalchemy import func
+        model = self.getModel(table)
+        query = self.db.session.query(model.status, func.count(model.id))
+        query = self.excludeDeleted(model, query, include_deleted)
+        return dict(query.group_by(model.status).all())
+
+    def getDailyCounts(self, table, days=30, include_deleted=False):
+        '''
+        Returns a list of (date, number of rows created) for the last
+        `days` days, oldest first. Days without rows are left out
+        '''
+        from sqlalchemy import func
+        model = self.getModel(table)
+        since = clock.now().date() - timedelta(days=days)
+        query = self.db.session.query(
+            model.created_date, func.count(model.id)
+        ).filter(model.created_date >= since)
+        query = self.excludeDeleted(model, query, include_deleted)
+        return query.group_by(model.created_date) \
+            .order_by(model.created_date).all()
+
+    def streamRows(self, table, batch_size=1000, exclude=(),
+                   include_deleted=False):
+        '''
+        Yields every row of a table as a tuple, ordered by id, using a
+        server-side cursor so that only `batch_size` rows are held in
+        memory at once. Columns named in `exclude` are left out
+        '''
+        model = self.getModel(table)
+        columns = [column for column in self.getColumns(table)
+                   if column.key not in exclude]
+        query = self.db.session.query(*columns)
+        query = self.excludeDeleted(model, query, include_deleted) \
+            .order_by(model.id) \
+            .execution_options(stream_results=True) \
+            .yield_per(batch_size)
+        for row in query:
+            yield tuple(row)
+
+    def getPage(self, table, limit=10, offset=0, sort=None, order='asc',
+                search=None, exclude=(), include_deleted=False):
+        '''
+        Returns the total number of rows matching `search` along with a
+        single page of them as dictionaries. Searches every text column
+        of the table and sorts by `sort` if it is a column of the table
+
+        Returns:
+            (total, rows)
+        '''
+        from sqlalchemy import String, Text, or_
+        model = self.getModel(table)
+        columns = [column for column in self.getColumns(table)
+                   if column.key not in exclude]
+
+        query = self.db.session.query(*columns)
+        query = self.excludeDeleted(model, query, include_deleted)
+        if search:
+            query = query.filter(or_(*[
+                column.ilike(f'%{search}%') for column in columns
+                if isinstance(column.type, (String, Text))
+            ]))
+        total = query.order_by(None).count()
+
+        # ColumnCollection.get only accepts strings
+        sortColumn = model.__table__.columns.get(sort or 'id', model.id)
+        if order == 'desc':
+            sortColumn = sortColumn.desc()
+        query = query.order_by(sortColumn).limit(limit).offset(offset)
+
+        keys = [column.key for column in columns]
+        return total, [dict(zip(keys, row)) for row in query]
+
+    def search(self, table, text, limit=10, offset=0,
+               include_deleted=False):
+        '''
+        Full-text searches the request or contact table, best matches
+        first. `text` accepts web search syntax such as "quoted phrases",
+        OR and -excluded words
+
+        Returns:
+            (total, rows)
+        '''
+        from sqlalchemy import func
+        model = self.getModel(table)
+        columns = self.getColumns(table)
+        tsquery = func.websearch_to_tsquery('english', text)
+        rank = func.ts_rank(model.search_vector, tsquery).label('rank')
+
+        query = self.db.session.query(*columns, rank) \
+            .filter(model.search_vector.op('@@')(tsquery))
+        query = self.excludeDeleted(model, query, include_deleted)
+        total = query.order_by(None).count()
+        query = query.order_by(rank.desc(), model.id.desc()) \
+            .limit(limit).offset(offset)
+
+        keys = [column.key for column in columns] + ['rank']
+        return total, [dict(zip(keys, row)) for row in query]
 
     def getAdmins(self):
         from .models import Admin
@@ -86,59 +759,126 @@ class DbConnector:
     def getAdmin(self, username=False, id=False):
         from .models import Admin
         if username:
+            # admins are looked up by username several times per log-in,
+            # so remember them for the rest of the request. Misses are not
+            # remembered, as the admin may be created later in the request
+            if has_request_context():
+                admins = g.setdefault('adminsByUsername', {})
+                if username not in admins:
+                    admin = Admin.query.filter_by(username=username).first()
+                    if admin is None:
+                        return None
+                    admins[username] = admin
+                return admins[username]
             return Admin.query.filter_by(username=username).first()
         if id:
-            return Admin.query.filter_by(id=id).first()
+            return Admin.query.get(int(id))
 
     def setAdmin(self, username, password, firstname, lastname,
-                 created_date=datetime.now(), commit=True):
+                 created_date=None, commit=None):
         from .models import Admin
         import flask_bcrypt
 
+        created_date = created_date or clock.now().date()
         encrypted_password = flask_bcrypt.generate_password_hash(
             password).decode('utf-8')
         admin = Admin(username, encrypted_password, firstname, lastname,
                       created_date=created_date)
         self.db.session.add(admin)
-        if commit:
-            self.db.session.commit()
+        self.save(commit)
         self.logger.log(f'Created admin - {admin}')
         return admin
 
-    def getRequests(self, order_date=False):
+    def getRequests(self, order_date=False, include_deleted=False):
         from .models import Request
+        query = self.excludeDeleted(Request, Request.query, include_deleted)
         if order_date:
             # order by created_date desc
-            return Request.query.order_by(Request.created_date.desc())
+            return query.order_by(Request.created_date.desc())
         else:
-            return Request.query.all()
+            return query.all()
 
-    def getRequest(self, id=False):
+    def getRequest(self, id=False, include_deleted=False):
         from .models import Request
         if id:
-            return Request.query.filter_by(id=id).first()
+            # checks the session's identity map before querying, so
+            # deleted requests are left out afterwards
+            request = Request.query.get(int(id))
+            if request is None or \
+                    (request.is_deleted and not include_deleted):
+                return None
+            return request
 
     def setRequest(self, emailaddress, phonenumber, name, contactmethod,
                    description, status='unread', is_deleted=False,
-                   created_date=datetime.now(), commit=True):
+                   created_date=None, idempotency_key=None,
+                   commit=None):
         from .models import Request
+
+        # defaulted per call; a default argument would be fixed at the
+        # time this module was imported
+        created_date = created_date or clock.now().date()
         request = Request(emailaddress, phonenumber, name, contactmethod,
-                          description, status, is_deleted, created_date)
+                          description, status, is_deleted, created_date,
+                          idempotency_key)
         self.db.session.add(request)
-        if commit:
-            self.db.session.commit()
+        self.rollups.recordCreated('request', created_date, status)
+        self.save(commit)
         self.logger.log(f'Created Request - {request}')
         return request
 
-    def updateRequest(self, id, status=False, commit=True):
+    def updateRequest(self, id, status=False, commit=None):
+        '''
+        Returns the updated request, or None if it was deleted or archived
+        '''
         request = self.getRequest(id=id)
+        if request is None:
+            return None
         if status:
+            self.rollups.recordStatusChange('request', request.status,
+                                            status, request.created_date)
             request.status = status
             self.logger.log(
                 f'Updated Request {request.id} status to {status}'
             )
-        if commit:
-            self.db.session.commit()
+        self.save(commit)
+        return request
+
+    def archive(self, days):
+        '''
+        Moves completed or deleted requests and read contacts created more
+        than `days` days ago into the archive tables, so the tables the
+        dashboard reads stay small
+
+        Returns:
+            (requests archived, contacts archived)
+        '''
+        from .models import ARCHIVED_COLUMNS
+
+        cutoff = clock.now().date() - timedelta(days=days)
+        conditions = {
+            'request': "(status = 'complete' OR is_deleted)",
+            'contact': "status = 'read'",
+        }
+        moved = []
+        for table, condition in conditions.items():
+            columns = ', '.join(ARCHIVED_COLUMNS[table])
+            result = self.db.session.execute(
+                f'WITH moved AS ('
+                f'DELETE FROM {table} '
+                f'WHERE {condition} AND created_date < :cutoff '
+                f'RETURNING {columns}) '
+                f'INSERT INTO {table}_archive ({columns}) '
+                f'SELECT {columns} FROM moved',
+                {'cutoff': cutoff}
+            )
+            moved.append(result.rowcount)
+        self.db.session.commit()
+        self.logger.log(
+            f'Archived {moved[0]} requests and {moved[1]} contacts '
+            f'created before {cutoff}'
+        )
+        return tuple(moved)
 
     def getImages(self):
         from .models import Image
@@ -147,19 +887,53 @@ class DbConnector:
     def getImage(self, id=False):
         from .models import Image
         if id:
-            return Image.query.filter_by(id=id).first()
+            # checks the session's identity map before querying
+            return Image.query.get(int(id))
 
     def setImage(self, name, description, filename,
-                 created_date=datetime.now(),
-                 commit=True):
+                 created_date=None, placeholder=None, width=None,
+                 height=None, commit=None):
         from .models import Image
-        image = Image(name, description, filename, created_date)
+
+        created_date = created_date or clock.now().date()
+        image = Image(name, description, filename, created_date,
+                      placeholder, width, height)
         self.db.session.add(image)
-        if commit:
-            self.db.session.commit()
+        self.save(commit)
         self.logger.log(f'Created Image - {image}')
         return image
 
+    def setImagePlaceholder(self, filename, placeholder, width, height,
+                            commit=None):
+        '''
+        Stores an image's placeholder and dimensions, creating the image
+        row if the file has none yet
+        '''
+        from .models import Image
+        image = Image.query.filter_by(filename=filename).first()
+        if image is None:
+            name = os.path.splitext(filename)[0]
+            return self.setImage(name, None, filename, None, placeholder,
+                                 width, height, commit=commit)
+        image.placeholder = placeholder
+        image.width = width
+        image.height = height
+        self.save(commit)
+        self.logger.log(f'Updated Image {filename} placeholder')
+        return image
+
+    def getImagePlaceholders(self):
+        '''
+        Returns a dictionary of filename to (placeholder, width, height)
+        for images with a placeholder
+        '''
+        from .models import Image
+        rows = self.db.session.query(
+            Image.filename, Image.placeholder, Image.width, Image.height
+        ).filter(Image.placeholder.isnot(None))
+        return {filename: (placeholder, width, height)
+                for filename, placeholder, width, height in rows}
+
     def getLayouts(self):
         from .models import Layout
         return Layout.query.all()
@@ -167,16 +941,18 @@ class DbConnector:
     def getLayout(self, id=False):
         from .models import Layout
         if id:
-            return Layout.query.filter_by(id=id).first()
+            # checks the session's identity map before querying
+            return Layout.query.get(int(id))
 
     def setLayout(self, endpoint, content_name, content, is_image,
-                  created_date, commit=True):
+                  created_date=None, commit=None):
         from .models import Layout
+
+        created_date = created_date or clock.now().date()
         layout = Layout(endpoint, content_name, content, is_image,
-                        created_date=datetime.now())
+                        created_date=created_date)
         self.db.session.add(layout)
-        if commit:
-            self.db.session.commit()
+        self.save(commit)
         self.logger.log(f'Created Layout - {layout}')
         return layout
 
@@ -191,28 +967,1108 @@ class DbConnector:
     def getContact(self, id=False):
         from .models import Contact
         if id:
-            return Contact.query.filter_by(id=id).first()
+            # checks the session's identity map before querying
+            return Contact.query.get(int(id))
 
     def setContact(self, emailaddress, name, content, status='unread',
-                   created_date=datetime.now(),
-                   commit=True):
+                   created_date=None, idempotency_key=None,
+                   commit=None):
         from .models import Contact
-        contact = Contact(emailaddress, name, content, status, created_date)
+
+        created_date = created_date or clock.now().date()
+        contact = Contact(emailaddress, name, content, status, created_date,
+                          idempotency_key)
         self.db.session.add(contact)
-        if commit:
-            self.db.session.commit()
+        self.rollups.recordCreated('contact', created_date, status)
+        self.save(commit)
         self.logger.log(f'Created Contact - {contact}')
         return contact
 
-    def updateContact(self, id, status=False, commit=True):
+    def updateContact(self, id, status=False, commit=None):
+        '''
+        Returns the updated contact, or None if it was deleted or archived
+        '''
         contact = self.getContact(id=id)
+        if contact is None:
+            return None
         if status:
+            self.rollups.recordStatusChange('contact', contact.status,
+                                            status, contact.created_date)
             contact.status = status
             self.logger.log(
                 f'Updated Contact {contact.id} status to {status}'
             )
-        if commit:
-            self.db.session.commit()
+        self.save(commit)
+        return contact
+
+
+class Exporter:
+    '''
+    Streams the rows of a table as CSV or NDJSON in constant memory
+
+    Use:
+        exporter = Exporter()
+        for chunk in exporter.export('request', 'csv'):
+            ...
+    '''
+
+    formats = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def __init__(self):
+        self.dbConn = DbConnector()
+
+    def export(self, table, format, batch_size=1000, exclude=(),
+               include_deleted=False):
+        '''
+        Yields the table in the given format, one chunk per `batch_size`
+        rows so that bytes start flowing immediately. Columns named in
+        `exclude` are left out
+        '''
+        columns = [column.key for column in self.dbConn.getColumns(table)
+                   if column.key not in exclude]
+        rows = self.dbConn.streamRows(table, batch_size=batch_size,
+                                      exclude=exclude,
+                                      include_deleted=include_deleted)
+        if format == 'csv':
+            return self._csv(columns, rows, batch_size)
+        return self._ndjson(columns, rows, batch_size)
+
+    def _csv(self, columns, rows, batch_size):
+        import csv
+        import io
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for i, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if i % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def _ndjson(self, columns, rows, batch_size):
+        import json
+
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(dict(zip(columns, row)), default=str))
+            if len(chunk) == batch_size:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+
+class DedupCache:
+    '''
+    Bounded least-recently-used cache of idempotency keys to the result of
+    their first submission. Backed by the unique idempotency_key columns
+    so duplicates are still caught once a key has been evicted, or when
+    it was first seen by another worker
+
+    Use:
+        dedupCache = DedupCache(maxsize=10000)
+        if dedupCache.get(key) is None:
+            ...
+            dedupCache.add(key, result)
+    '''
+
+    def __init__(self, maxsize=10000):
+        import threading
+        from collections import OrderedDict
+
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        Returns the result stored for a key, or None if it is unseen
+        '''
+        with self.lock:
+            if key not in self.keys:
+                return None
+            self.keys.move_to_end(key)
+            return self.keys[key]
+
+    def add(self, key, result=True):
+        '''
+        Stores the result of a key, evicting the least recently used
+        key once the cache is full
+        '''
+        with self.lock:
+            self.keys[key] = result
+            self.keys.move_to_end(key)
+            while len(self.keys) > self.maxsize:
+                self.keys.popitem(last=False)
+
+
+class IntakeQueue:
+    '''
+    Durable local queue of request and contact submissions. Submissions
+    are appended to a SQLite file and acknowledged right away, while a
+    background committer batch-inserts them into Postgres. Submissions
+    Postgres rejects are moved to the dead_submission table along with
+    the error, so they never hold up the ones queued after them
+
+    Use:
+        intakeQueue = IntakeQueue()
+        intakeQueue.init_app(app)
+        intakeQueue.put('request', {...})
+    '''
+
+    # seconds after which a claimed but uncommitted batch is retried
+    claim_timeout = 60
+
+    def init_app(self, app):
+        '''
+        Creates the queue file and starts the background committer once
+        the worker serves its first request, so that cli commands and
+        other short-lived processes never claim a batch they might not
+        live to commit
+        '''
+        import threading
+
+        self.app = app
+        self.started = False
+        self.path = app.config['INTAKE_QUEUE_PATH']
+        self.batch_size = app.config['INTAKE_QUEUE_BATCH_SIZE']
+        self.interval = app.config['INTAKE_QUEUE_INTERVAL']
+        self.dbConn = DbConnector()
+        self.logger = Logger()
+
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self.connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS submission ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'kind TEXT NOT NULL, '
+                'payload TEXT NOT NULL, '
+                'claimed_by TEXT, '
+                'claimed_at REAL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS dead_submission ('
+                'id INTEGER PRIMARY KEY, '
+                'kind TEXT NOT NULL, '
+                'payload TEXT NOT NULL, '
+                'error TEXT NOT NULL, '
+                'failed_at REAL NOT NULL)'
+            )
+
+        @app.before_first_request
+        def startCommitter():
+            if not self.started and app.config['BACKGROUND_THREADS']:
+                self.started = True
+                threading.Thread(target=self.run, daemon=True).start()
+
+    def connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=30)
+
+    def put(self, kind, payload):
+        '''
+        Appends a 'request' or 'contact' submission to the queue
+
+        Returns:
+            id of the queued submission
+        '''
+        import json
+
+        return offload(self.insert, kind, json.dumps(payload))
+
+    def insert(self, kind, payload):
+        with self.connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO submission (kind, payload) VALUES (?, ?)',
+                (kind, payload)
+            )
+        return cursor.lastrowid
+
+    def claim(self):
+        '''
+        Claims a batch of unclaimed (or abandoned) submissions for this
+        committer so that other workers skip them
+        '''
+        import json
+        import threading
+
+        owner = f'{os.getpid()}-{threading.get_ident()}'
+        rows = offload(self.claimRows, owner, time.time())
+        return [(id, kind, json.loads(payload))
+                for id, kind, payload in rows]
+
+    def claimRows(self, owner, now):
+        with self.connect() as conn:
+            conn.execute(
+                'UPDATE submission SET claimed_by = ?, claimed_at = ? '
+                'WHERE id IN (SELECT id FROM submission '
+                'WHERE claimed_at IS NULL OR claimed_at < ? '
+                'ORDER BY id LIMIT ?)',
+                (owner, now, now - self.claim_timeout, self.batch_size)
+            )
+            rows = conn.execute(
+                'SELECT id, kind, payload FROM submission '
+                'WHERE claimed_by = ? AND claimed_at = ? ORDER BY id',
+                (owner, now)
+            ).fetchall()
+        return rows
+
+    def commit(self):
+        '''
+        Inserts one claimed batch into Postgres in a single transaction
+        and removes it from the queue. Duplicates are skipped, and
+        submissions Postgres rejects are moved to dead_submission
+
+        Returns:
+            Number of submissions taken off the queue
+        '''
+        batch = self.claim()
+        if not batch:
+            return 0
+
+        from sqlalchemy.exc import DBAPIError
+
+        session = self.dbConn.db.session
+        failed = []
+        for id, kind, payload in batch:
+            try:
+                # a savepoint per submission lets one be skipped without
+                # losing the rest of the batch
+                with session.begin_nested():
+                    if kind == 'request':
+                        self.dbConn.setRequest(**payload, commit=False)
+                    elif kind == 'contact':
+                        self.dbConn.setContact(**payload, commit=False)
+            except DBAPIError as e:
+                # unique_violation on idempotency_key
+                if getattr(e.orig, 'pgcode', None) == '23505':
+                    self.logger.log(
+                        f'Skipped duplicate {kind} submission {id}')
+                else:
+                    self.logger.log(
+                        f'Rejected {kind} submission {id} - {e.orig}')
+                    failed.append((id, str(e.orig).strip()))
+        # rejected submissions are only moved once the rest are stored,
+        # so a failed commit leaves the whole batch to be retried
+        session.commit()
+
+        offload(self.delete, [id for id, kind, payload in batch], failed)
+        self.logger.log(f'Committed {len(batch) - len(failed)} queued '
+                        f'submissions')
+        return len(batch)
+
+    def delete(self, ids, failed=()):
+        '''
+        Removes submissions from the queue, moving the failed ones, given
+        as (id, error), to dead_submission
+        '''
+        with self.connect() as conn:
+            conn.executemany(
+                'INSERT INTO dead_submission '
+                '(id, kind, payload, error, failed_at) '
+                'SELECT id, kind, payload, ?, ? FROM submission '
+                'WHERE id = ?',
+                [(error, time.time(), id) for id, error in failed]
+            )
+            conn.executemany('DELETE FROM submission WHERE id = ?',
+                             [(id,) for id in ids])
+
+    def getDeadSubmissions(self):
+        '''
+        Returns every submission Postgres rejected as a list of
+        (id, kind, payload, error), oldest first
+        '''
+        import json
+
+        with self.connect() as conn:
+            rows = conn.execute(
+                'SELECT id, kind, payload, error FROM dead_submission '
+                'ORDER BY id'
+            ).fetchall()
+        return [(id, kind, json.loads(payload), error)
+                for id, kind, payload, error in rows]
+
+    def run(self):
+        '''
+        Background committer loop
+        '''
+        with self.app.app_context():
+            while True:
+                try:
+                    # keep going while full batches are waiting
+                    if self.commit() == self.batch_size:
+                        continue
+                except Exception as e:
+                    self.dbConn.db.session.rollback()
+                    self.logger.log(f'Intake queue commit failed - {e}')
+                time.sleep(self.interval)
+
+
+class CronSchedule:
+    '''
+    Five field cron expression (minute, hour, day of month, month, day of
+    week with Sunday as 0 or 7). Fields accept `*`, numbers, ranges
+    (`1-5`), steps (`*/15`) and lists (`0,30`). As in cron, when both the
+    day of month and day of week are restricted, a day matching either
+    one matches
+
+    Use:
+        schedule = CronSchedule('*/15 9-17 * * 1-5')
+        schedule.matches(clock.now())
+    '''
+
+    ranges = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != len(self.ranges):
+            raise ValueError(f'Invalid cron expression: {expression}')
+        self.expression = expression
+        self.fields = [self.parseField(field, low, high)
+                       for field, (low, high) in zip(fields, self.ranges)]
+        # 7 is another name for Sunday
+        if 7 in self.fields[4]:
+            self.fields[4] = self.fields[4] - {7} | {0}
+        self.dayRestricted = not fields[2].startswith('*')
+        self.weekdayRestricted = not fields[4].startswith('*')
+
+    @staticmethod
+    def parseField(field, low, high):
+        '''
+        Returns the set of values a cron field matches
+        '''
+        values = set()
+        for part in field.split(','):
+            span, _, step = part.partition('/')
+            if span == '*':
+                start, end = low, high
+            elif '-' in span:
+                start, end = map(int, span.split('-'))
+            else:
+                # a single value with a step runs to the end of the range
+                start = int(span)
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f'Invalid cron field: {field}')
+            values.update(range(start, end + 1, int(step or 1)))
+        return frozenset(values)
+
+    def matches(self, moment):
+        minute, hour, day, month, weekday = self.fields
+        dayMatches = moment.day in day
+        weekdayMatches = moment.isoweekday() % 7 in weekday
+        if self.dayRestricted and self.weekdayRestricted:
+            dayMatches = dayMatches or weekdayMatches
+        else:
+            dayMatches = dayMatches and weekdayMatches
+        return (moment.minute in minute and moment.hour in hour
+                and moment.month in month and dayMatches)
+
+
+class Scheduler:
+    '''
+    In-app scheduler of periodic jobs. Every worker runs the scheduler,
+    but each scheduled minute of a job runs on exactly one of them: a
+    worker must take the job's Postgres advisory lock and then record the
+    minute in the job_run table, which only one worker can do. Host-scoped
+    jobs, for work on a container's own files, run once per host instead.
+    Durations and failures are recorded on the job's JobRun row
+
+    Use:
+        scheduler = Scheduler()
+
+        @scheduler.job('archive', '0 3 * * *')
+        def archive():
+            ...
+
+        scheduler.init_app(app)
+    '''
+
+    def __init__(self):
+        self.jobs = {}
+        self.logger = Logger()
+        self.started = False
+
+    def job(self, name, schedule, scope='cluster'):
+        '''
+        Registers a function as a job run on a cron schedule, once across
+        every host ('cluster') or once per host ('host')
+        '''
+        def register(func):
+            self.jobs[name] = (CronSchedule(schedule), func, scope)
+            return func
+        return register
+
+    def init_app(self, app):
+        '''
+        Starts the scheduler once the worker serves its first request, so
+        that cli commands and other short-lived processes never claim a job
+        they might not live to finish
+        '''
+        self.app = app
+
+        @app.before_first_request
+        def startScheduler():
+            import threading
+
+            if not self.started and app.config['BACKGROUND_THREADS']:
+                self.started = True
+                threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        '''
+        Checks every job at the start of each minute. Minutes missed while
+        a long job ran are caught up one by one
+        '''
+        minute = clock.now().replace(second=0, microsecond=0)
+        while True:
+            minute += timedelta(minutes=1)
+            time.sleep(max(0, (minute - clock.now()).total_seconds()))
+            with self.app.app_context():
+                for name, (schedule, func, scope) in self.jobs.items():
+                    if not schedule.matches(minute):
+                        continue
+                    try:
+                        self.runJob(name, minute)
+                    except Exception as e:
+                        self.logger.log(f'Scheduler could not run {name} '
+                                        f'- {e}')
+
+    def runJob(self, name, minute):
+        '''
+        Runs a job for a scheduled minute unless another worker holds its
+        lock or has already run it for that minute. Must be called
+        inside an app context
+
+        Returns:
+            id of the job's JobRun, or None if the job was skipped
+        '''
+        import socket
+        import zlib
+        from sqlalchemy import text
+        from .models import db
+
+        schedule, func, scope = self.jobs[name]
+        host = socket.gethostname() if scope == 'host' else ''
+        key = zlib.crc32(f'job:{name}:{host}'.encode())
+
+        # the lock is held on its own primary connection for as long as
+        # the job runs, and is released if the worker dies
+        with db.engine.connect() as lock:
+            locked = lock.execute(
+                text('SELECT pg_try_advisory_lock(:key)'), key=key
+            ).scalar()
+            if not locked:
+                return None
+            try:
+                return self.record(name, host, minute, func)
+            finally:
+                lock.execute(text('SELECT pg_advisory_unlock(:key)'),
+                             key=key)
+
+    def record(self, name, host, minute, func):
+        '''
+        Claims the job's minute in job_run, runs the job and records how
+        it went. Must be called holding the job's lock
+        '''
+        import socket
+        import traceback
+        from sqlalchemy.dialects.postgresql import insert
+        from .models import JobRun, db
+
+        # holding the lock means earlier runs still marked as running
+        # belong to workers that died
+        JobRun.query.filter_by(name=name, host=host, status='running') \
+            .update({'status': 'abandoned'})
+        statement = insert(JobRun).values(
+            name=name, host=host, scheduled_for=minute,
+            started_at=clock.now(), status='running',
+            worker=f'{socket.gethostname()}-{os.getpid()}'
+        ).on_conflict_do_nothing(
+            index_elements=['name', 'host', 'scheduled_for']
+        ).returning(JobRun.id)
+        runId = db.session.execute(statement).scalar()
+        db.session.commit()
+        if runId is None:
+            return None
+
+        self.logger.log(f'Running job {name}')
+        started = time.perf_counter()
+        status, error = 'success', None
+        try:
+            func()
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'failed', traceback.format_exc()
+            self.logger.log(f'Job {name} failed - {e}')
+
+        JobRun.query.filter_by(id=runId).update({
+            'finished_at': clock.now(),
+            'duration_ms': int((time.perf_counter() - started) * 1000),
+            'status': status,
+            'error': error,
+        })
+        db.session.commit()
+        return runId
+
+    def getRuns(self, name=None, limit=20):
+        '''
+        Returns the most recent job runs, newest first
+        '''
+        from .models import JobRun
+
+        query = JobRun.query
+        if name:
+            query = query.filter_by(name=name)
+        return query.order_by(JobRun.started_at.desc()).limit(limit).all()
+
+    def prune(self, days):
+        '''
+        Deletes finished job runs started more than `days` days ago
+
+        Returns:
+            Number of runs deleted
+        '''
+        from .models import JobRun, db
+
+        cutoff = clock.now() - timedelta(days=days)
+        deleted = JobRun.query.filter(
+            JobRun.started_at < cutoff, JobRun.status != 'running'
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+class QueryBudgetExceeded(Exception):
+    '''
+    Raised when a route runs more SQL statements than its configured
+    query budget allows
+    '''
+
+
+class QueryDebugger:
+    '''
+    Counts the SQL statements each request runs in order to flag
+    repeated identical statements, slow statements and routes that go
+    over their query budget. Intended for development and testing only
+
+    Use:
+        queryDebugger = QueryDebugger()
+        queryDebugger.init_app(app)
+    '''
+
+    def init_app(self, app):
+        '''
+        Listens to the app's primary and read replica engines and hooks
+        into every request
+        '''
+        from sqlalchemy import event
+        from .models import db
+
+        self.logger = Logger()
+        self.engine = db.get_engine(app)
+        # reads routed to a replica count against the budget as well
+        engines = [self.engine] + [
+            db.get_engine(app, bind=bind)
+            for bind in app.config['SQLALCHEMY_REPLICA_BINDS']
+        ]
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute',
+                         self._beforeExecute)
+            event.listen(engine, 'after_cursor_execute',
+                         self._afterExecute)
+        app.before_request(self._startRequest)
+        app.after_request(self._endRequest)
+
+    def _beforeExecute(self, conn, cursor, statement, parameters,
+                       context, executemany):
+        context._query_start = time.perf_counter()
+
+    def _afterExecute(self, conn, cursor, statement, parameters,
+                      context, executemany):
+        if not has_request_context() or 'queries' not in g:
+            return
+        duration = (time.perf_counter() - context._query_start) * 1000
+        g.queries.append((statement, parameters, duration, conn.engine))
+
+    def _startRequest(self):
+        g.queries = []
+
+    def _endRequest(self, response):
+        queries = g.pop('queries', None)
+        if queries is None:
+            return response
+
+        endpoint = request.endpoint
+        self.logger.log(f'{endpoint} ran {len(queries)} queries')
+
+        # flag identical statements run more than once
+        repeated = Counter(
+            (statement, repr(parameters))
+            for statement, parameters, duration, engine in queries
+        )
+        for (statement, parameters), count in repeated.items():
+            if count > 1:
+                self.logger.log(
+                    f'Repeated query ({count}x) in {endpoint}: '
+                    f'{statement} {parameters}'
+                )
+
+        # log slow statements along with their query plan
+        slow_ms = current_app.config['DB_SLOW_QUERY_MS']
+        for statement, parameters, duration, engine in queries:
+            if duration > slow_ms:
+                self.logger.log(
+                    f'Slow query ({duration:.1f}ms) in {endpoint}: '
+                    f'{statement} {parameters}'
+                )
+                for line in self.explain(statement, parameters, engine):
+                    self.logger.log(f'    {line}')
+
+        budgets = current_app.config['DB_QUERY_BUDGET']
+        budget = budgets.get(endpoint,
+                             current_app.config['DB_QUERY_BUDGET_DEFAULT'])
+        if budget is not None and len(queries) > budget:
+            message = (f'{endpoint} ran {len(queries)} queries '
+                       f'with a budget of {budget}')
+            self.logger.log(message)
+            if current_app.testing:
+                raise QueryBudgetExceeded(message)
+        return response
+
+    def explain(self, statement, parameters, engine=None):
+        '''
+        Returns the query plan of a statement on the engine that ran it,
+        the primary by default, as a list of lines. Only supported on
+        Postgres
+        '''
+        engine = engine or self.engine
+        if engine.dialect.name != 'postgresql':
+            return []
+        if not statement.lstrip().upper().startswith(
+                ('SELECT', 'INSERT', 'UPDATE', 'DELETE')):
+            return []
+        result = engine.execute(f'EXPLAIN {statement}', parameters)
+        return [row[0] for row in result]
+
+
+class RequestProfiler:
+    '''
+    Profiles a single request with cProfile when a logged-in admin asks
+    for it through the `profile` query parameter or the `X-Profile`
+    header. Output is stored as a .prof file that can be downloaded
+    from /admin/profiles/<filename>
+
+    Use:
+        requestProfiler = RequestProfiler()
+        requestProfiler.init_app(app)
+    '''
+
+    def init_app(self, app):
+        '''
+        Hooks into every request of the app
+        '''
+        self.logger = Logger()
+        app.before_request(self._startRequest)
+        app.after_request(self._endRequest)
+
+    def isRequested(self):
+        '''
+        Checks if the current request asked to be profiled. The user
+        is only looked up once the parameter or header is present so
+        that normal requests do no extra work
+        '''
+        if 'profile' not in request.args and \
+                'X-Profile' not in request.headers:
+            return False
+        from flask_login import current_user
+        return current_user.is_authenticated
+
+    def _startRequest(self):
+        if self.isRequested():
+            import cProfile
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _endRequest(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+
+        outputdir = current_app.config['PROFILER_OUTPUT_DIR']
+        if not os.path.exists(outputdir):
+            os.makedirs(outputdir)
+
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        filename = f'{timestamp}_{request.endpoint}.prof'
+        profiler.dump_stats(f'{outputdir}/{filename}')
+        self.logger.log(f'Profiled {request.path} to {filename}')
+
+        response.headers['X-Profile-File'] = f'/admin/profiles/{filename}'
+        return response
+
+
+class TemplateCache:
+    '''
+    Production template mode: compiled templates are kept in a bytecode
+    cache shared by every worker, and can be compiled ahead of time so
+    that no request pays compile latency
+
+    Use:
+        templateCache = TemplateCache()
+        templateCache.init_app(app)
+        templateCache.warm(app)
+    '''
+
+    def init_app(self, app):
+        '''
+        Points the app's jinja environment at the shared bytecode cache.
+        Must run before the first template is rendered
+        '''
+        from jinja2 import FileSystemBytecodeCache
+
+        directory = app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = dict(
+            app.jinja_options,
+            bytecode_cache=FileSystemBytecodeCache(directory)
+        )
+
+    def warm(self, app):
+        '''
+        Compiles every template under app/templates, which also fills
+        the bytecode cache for the other workers
+
+        Returns:
+            Number of templates compiled
+        '''
+        names = app.jinja_env.list_templates()
+        for name in names:
+            # templates include each other as both 'x.html' and
+            # './x.html', which jinja caches separately
+            app.jinja_env.get_template(name)
+            app.jinja_env.get_template(f'./{name}')
+        return len(names)
+
+
+class Freezer:
+    '''
+    Pre-renders the public pages through the app's own routes into static
+    html, along with gzip variants, for nginx to serve to visitors who are
+    not logged in. Pages are re-frozen whenever Image or Layout rows are
+    committed, and a scheduled job catches changes made elsewhere by
+    comparing a fingerprint of those rows
+
+    Use:
+        freezer = Freezer()
+        freezer.init_app(app)
+        freezer.freeze()
+    '''
+
+    # set while an admin is logged in, so nginx passes them to the app
+    cookie = 'logged_in'
+
+    def __init__(self):
+        self.dbConn = DbConnector()
+        self.logger = Logger()
+        self.serving = False
+
+    def init_app(self, app):
+        '''
+        Keeps the logged-in cookie in step with the session and re-freezes
+        the pages after Image or Layout rows are committed, once the
+        worker serves its first request. Cli commands leave their changes
+        to `flask freeze` and the freeze job rather than start a thread
+        they might exit before it finishes
+        '''
+        from flask_login import current_user
+        from sqlalchemy import event
+        from .models import Image, Layout, db
+
+        self.app = app
+        self.directory = app.config['FREEZE_DIR']
+        self.endpoints = app.config['FREEZE_ENDPOINTS']
+
+        @app.before_first_request
+        def markServing():
+            self.serving = app.config['BACKGROUND_THREADS']
+
+        @app.after_request
+        def markLoggedIn(response):
+            loggedIn = current_user.is_authenticated
+            if loggedIn and self.cookie not in request.cookies:
+                response.set_cookie(self.cookie, '1', httponly=True,
+                                    samesite='Lax')
+            elif not loggedIn and self.cookie in request.cookies:
+                response.delete_cookie(self.cookie)
+            return response
+
+        for model in (Image, Layout):
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                if not event.contains(model, name, self.markChanged):
+                    event.listen(model, name, self.markChanged)
+        if not event.contains(db.session, 'after_commit', self.afterCommit):
+            event.listen(db.session, 'after_commit', self.afterCommit)
+
+    @staticmethod
+    def markChanged(mapper, connection, target):
+        from sqlalchemy.orm import object_session
+
+        object_session(target).info['freeze'] = True
+
+    def afterCommit(self, session):
+        '''
+        Re-freezes in a thread of its own, with its own session, so the
+        committing request neither waits nor shares its session
+        '''
+        import threading
+
+        if not session.info.pop('freeze', False) or not self.serving:
+            return
+
+        def refreeze():
+            with self.app.app_context():
+                try:
+                    # rows re-saved with the same values change nothing
+                    self.freeze(ifChanged=True)
+                except Exception as e:
+                    self.logger.log(f'Re-freezing pages failed - {e}')
+
+        threading.Thread(target=refreeze, daemon=True).start()
+
+    def getPath(self, url):
+        '''
+        Returns the file a url is frozen to, e.g. /designs to designs.html
+        '''
+        return f"{self.directory}/{url.strip('/') or 'index'}.html"
+
+    def getFingerprint(self):
+        '''
+        Returns a hash of the Image and Layout rows the pages depend on
+        '''
+        import hashlib
+        from .models import Image, Layout
+
+        digest = hashlib.sha1()
+        for model in (Image, Layout):
+            rows = self.dbConn.db.session.query(
+                *model.__table__.columns).order_by(model.id)
+            for row in rows:
+                digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def write(path, data):
+        '''
+        Writes a file atomically, so nginx never serves half of one. Each
+        write gets its own temporary file, as freezes can overlap
+        '''
+        import tempfile
+
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         prefix='.freeze-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # mkstemp creates files readable by their owner only
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def render(self, url):
+        '''
+        Renders a page through the app's routes like a request would,
+        except that the first-request hooks, which start the background
+        threads of a serving worker, are never triggered
+        '''
+        with self.app.test_request_context(url):
+            try:
+                response = self.app.preprocess_request()
+                if response is None:
+                    response = self.app.dispatch_request()
+            except Exception as e:
+                response = self.app.handle_user_exception(e)
+            return self.app.finalize_request(response)
+
+    def freeze(self, ifChanged=False):
+        '''
+        Renders every public page and writes it, with a gzip variant, to
+        the frozen directory
+
+        Returns:
+            Number of pages frozen
+        '''
+        import gzip
+        import io
+        from flask import url_for
+
+        if self.app.config['IMAGE_SERVING'] == 's3' and \
+                not os.environ.get('AWS_IMAGE_CDN_URL'):
+            # signed image urls would expire inside the frozen pages
+            self.logger.log('Not freezing pages with signed image urls')
+            return 0
+
+        fingerprint = self.getFingerprint()
+        fingerprintPath = f'{self.directory}/.fingerprint'
+        if ifChanged and os.path.exists(fingerprintPath):
+            with open(fingerprintPath) as f:
+                if f.read() == fingerprint:
+                    return 0
+
+        frozen = 0
+        for endpoint in self.endpoints:
+            if endpoint not in self.app.view_functions:
+                self.logger.log(f'Skipped freezing missing page {endpoint}')
+                continue
+            with self.app.test_request_context():
+                url = url_for(endpoint)
+            response = self.render(url)
+            if response.status_code != 200:
+                self.logger.log(f'Skipped freezing {url} - '
+                                f'{response.status_code}')
+                continue
+
+            body = response.get_data()
+            compressed = io.BytesIO()
+            # a fixed mtime keeps unchanged pages byte for byte the same
+            with gzip.GzipFile(fileobj=compressed, mode='wb',
+                               compresslevel=9, mtime=0) as f:
+                f.write(body)
+
+            path = self.getPath(url)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.write(f'{path}.gz', compressed.getvalue())
+            self.write(path, body)
+            frozen += 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.write(fingerprintPath, fingerprint.encode())
+        self.logger.log(f'Froze {frozen} pages')
+        return frozen
+
+
+class ImagePlaceholders:
+    '''
+    Tiny inline placeholders (low-quality image previews) shown while
+    the real gallery images load. Placeholders are computed once per image
+    at ingest and kept in memory by each worker for `ttl` seconds
+
+    Use:
+        imagePlaceholders = ImagePlaceholders()
+        placeholder, width, height = imagePlaceholders.get('cabinet00.jpeg')
+    '''
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.dbConn = DbConnector()
+        self.placeholders = {}
+        self.loadedAt = 0
+
+    def get(self, filename):
+        '''
+        Returns (placeholder, width, height), or Nones if the image has
+        no placeholder yet
+        '''
+        if time.time() - self.loadedAt > self.ttl:
+            self.placeholders = self.dbConn.getImagePlaceholders()
+            self.loadedAt = time.time()
+        return self.placeholders.get(filename, (None, None, None))
+
+    @staticmethod
+    def compute(path, size=16):
+        '''
+        Computes a blurred `size` pixel JPEG preview of an image as a
+        data uri, along with the image's full width and height
+        '''
+        import base64
+        import io
+        from PIL import Image, ImageFilter
+
+        with Image.open(path) as image:
+            width, height = image.size
+            image.thumbnail((size, size))
+            preview = image.convert('RGB').filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        preview.save(buffer, 'JPEG', quality=40)
+        encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+        return f'data:image/jpeg;base64,{encoded}', width, height
+
+    def ingest(self, directory, force=False):
+        '''
+        Computes and stores placeholders for the photos (jpegs) in a
+        directory that do not have one yet, or for all of them when
+        `force` is set. Image rows are created for photos that have none.
+        Logos and other graphics are left out
+
+        Returns:
+            Number of images ingested
+        '''
+        existing = {} if force else self.dbConn.getImagePlaceholders()
+        filenames = [f for f in os.listdir(directory)
+                     if f.lower().endswith(('.jpg', '.jpeg'))
+                     and f not in existing]
+        if not filenames:
+            return 0
+        for filename in filenames:
+            placeholder, width, height = offload(
+                self.compute, f'{directory}/{filename}')
+            self.dbConn.setImagePlaceholder(filename, placeholder, width,
+                                            height, commit=False)
+        self.dbConn.db.session.commit()
+        self.loadedAt = 0
+        return len(filenames)
+
+
+class StartupState:
+    '''
+    Tracks a worker's progress through create_app so that /readyz can
+    tell a worker that is still starting up from one that can serve
+
+    Use:
+        startupState = StartupState()
+        startupState.set('creating tables')
+    '''
+
+    def __init__(self):
+        self.state = 'starting'
+
+    def set(self, state):
+        '''
+        Moves to the next startup state and logs the progress
+        '''
+        self.state = state
+        Logger().log(f'Startup state: {state}')
+
+    @property
+    def started(self):
+        return self.state == 'started'
+
+    @staticmethod
+    def hasImages(directory):
+        '''
+        Returns whether the images directory exists and holds any images
+        '''
+        return os.path.isdir(directory) and bool(os.listdir(directory))
+
+    def syncImages(self, s3Conn):
+        '''
+        Downloads images from S3 and computes their placeholders, blocking
+        until done. Must be called inside an app context
+        '''
+        s3Conn.downloadImages()
+        ImagePlaceholders().ingest(s3Conn.LocalImagePath)
 
 
 class S3Connecter:
@@ -223,15 +2079,66 @@ class S3Connecter:
 
     def __init__(self):
         '''
-        Initializes by connecting to S3
+        Initializes with the project's bucket settings. The connection to
+        S3 is only made on first use
         '''
         self.S3ImageBucket = os.environ['AWS_PROJECT_BUCKET']
         self.S3ImageFolder = os.environ['AWS_PROJECT_BUCKET_IMAGE_DIR']
         self.LocalImagePath = os.environ['AWS_LOCAL_IMAGE_PATH']
 
-        # connect to S3
-        self.s3Client = boto3.client('s3')
-        self.s3Resource = boto3.resource('s3')
+        self.S3EndpointUrl = os.environ.get('AWS_S3_ENDPOINT_URL') or None
+        self.CdnUrl = os.environ.get('AWS_IMAGE_CDN_URL', '').rstrip('/')
+
+        self._s3Client = None
+        self._s3Resource = None
+        # filename -> (url, time the url expires)
+        self.imageUrls = {}
+
+    @property
+    def s3Client(self):
+        '''
+        boto3 S3 client, created on first use and reused afterwards
+        '''
+        if self._s3Client is None:
+            import boto3
+            self._s3Client = boto3.client(
+                's3', endpoint_url=self.S3EndpointUrl)
+        return self._s3Client
+
+    @property
+    def s3Resource(self):
+        '''
+        boto3 S3 resource, created on first use and reused afterwards
+        '''
+        if self._s3Resource is None:
+            import boto3
+            self._s3Resource = boto3.resource(
+                's3', endpoint_url=self.S3EndpointUrl)
+        return self._s3Resource
+
+    def getImageUrl(self, filename, expiry=3600):
+        '''
+        Returns a url the browser can load an image from directly. Uses
+        the CDN when one is configured, otherwise a pre-signed url that
+        is cached and regenerated once less than a tenth of its
+        lifetime is left
+        '''
+        key = f'{self.S3ImageFolder}{filename}'
+        if self.CdnUrl:
+            return f'{self.CdnUrl}/{key}'
+
+        now = time.time()
+        cached = self.imageUrls.get(filename)
+        if cached and cached[1] - now > expiry / 10:
+            return cached[0]
+
+        url = self.s3Client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.S3ImageBucket, 'Key': key},
+            ExpiresIn=expiry
+        )
+        self.imageUrls[filename] = (url, now + expiry)
+        return url
 
     def uploadImages(self):
         '''
@@ -239,6 +2146,8 @@ class S3Connecter:
         '''
         logger = Logger()
         self.images = [f for f in os.listdir(self.LocalImagePath)]
+        # placeholders are computed once per image, as it is ingested
+        ImagePlaceholders().ingest(self.LocalImagePath)
         for imageName in self.images:
             self.s3Client.upload_file(
                 f'{self.LocalImagePath}/{imageName}',  # local image name
@@ -269,20 +2178,34 @@ class MockData:
     '''
     Loads database with mock data for developing and testing
     '''
-    from faker import Faker
 
-    fake = Faker()
-    dbConn = DbConnector()
+    _fake = None
+
+    def __init__(self):
+        self.dbConn = DbConnector()
+
+    @property
+    def fake(self):
+        '''
+        Shared Faker instance, created on first use so that faker is
+        never imported in production
+        '''
+        if MockData._fake is None:
+            from faker import Faker
+            MockData._fake = Faker()
+        return MockData._fake
 
     def fakeDate(
         self,
-        startdate=datetime.fromisoformat('2020-01-01'),
-        enddate=datetime.now()
+        startdate=None,
+        enddate=None
     ):
         '''
-        Generate fake date for use in created_date
+        Generate fake date for use in created_date, between the start of
+        2020 and today by default
         '''
-
+        startdate = startdate or datetime(2020, 1, 1).date()
+        enddate = enddate or clock.now().date()
         return self.fake.date_between(startdate, enddate)
 
     def fakeDescription(
@@ -305,28 +2228,91 @@ class MockData:
         Check if database is empty
         '''
 
-        admins = self.dbConn.getAdmins()
-        requests = self.dbConn.getRequests()
-        images = self.dbConn.getImages()
-
-        if len(admins) > 5 or len(requests) > 5 or len(images) > 5:
-            return True
+        for table in ('admin', 'request', 'image'):
+            if self.dbConn.exists(table, offset=5, include_deleted=True):
+                return True
         return False
 
+    def fakeAdmin(self):
+        '''
+        Generate a fake Admin row with a plain-text password
+        '''
+
+        return {
+            'username': self.fake.user_name(),
+            'password': self.fake.password(),
+            'firstname': self.fake.first_name(),
+            'lastname': self.fake.last_name(),
+            'created_date': self.fakeDate(),
+        }
+
+    def fakeRequest(self):
+        '''
+        Generate a fake Request row
+        '''
+
+        return {
+            'emailaddress': self.fake.email(),
+            'phonenumber': self.fake.phone_number(),
+            'name': self.fake.name(),
+            'contactmethod': self.fake.random_element([
+                'phone', 'email', None
+            ]),
+            'description': self.fakeDescription(),
+            'status': self.fake.random_element([
+                'unread', 'read', 'in progress', 'ready to deliver', 'complete'
+            ]),
+            'is_deleted': self.fake.boolean(),
+            'created_date': self.fakeDate(),
+        }
+
+    def fakeImage(self):
+        '''
+        Generate a fake Image row
+        '''
+
+        return {
+            'name': self.fake.word(),
+            'description': self.fakeDescription(),
+            'filename': self.fake.file_path(),
+            'created_date': self.fakeDate(),
+        }
+
+    def fakeLayout(self):
+        '''
+        Generate a fake Layout row
+        '''
+
+        return {
+            'endpoint': self.fake.uri_path(),
+            'content_name': self.fake.word(),
+            'content': self.fakeDescription(2, 3),
+            'is_image': self.fake.boolean(),
+            'created_date': self.fakeDate(),
+        }
+
+    def fakeContact(self):
+        '''
+        Generate a fake Contact row
+        '''
+
+        return {
+            'emailaddress': self.fake.email(),
+            'name': self.fake.name(),
+            'content': self.fakeDescription(),
+            'status': self.fake.random_element([
+                'unread', 'read',
+            ]),
+            'created_date': self.fakeDate(),
+        }
+
     def loadAdmin(self, db, num_rows=3):
         '''
         Load Admin table with fake data
         '''
 
         for i in range(num_rows):
-            username = self.fake.user_name()
-            password = self.fake.password()
-            firstname = self.fake.first_name()
-            lastname = self.fake.last_name()
-            created_date = self.fakeDate()
-
-            self.dbConn.setAdmin(username, password, firstname, lastname,
-                                 created_date, commit=False)
+            self.dbConn.setAdmin(**self.fakeAdmin(), commit=False)
         db.session.commit()
 
     def loadRequest(self, db, num_rows=8):
@@ -335,22 +2321,7 @@ class MockData:
         '''
 
         for i in range(num_rows):
-            emailaddress = self.fake.email()
-            phonenumber = self.fake.phone_number()
-            name = self.fake.name()
-            contactmethod = self.fake.random_element([
-                'phone', 'email', None
-            ])
-            description = self.fakeDescription()
-            status = self.fake.random_element([
-                'unread', 'read', 'in progress', 'ready to deliver', 'complete'
-            ])
-            is_deleted = self.fake.boolean()
-            created_date = self.fakeDate()
-
-            self.dbConn.setRequest(emailaddress, phonenumber, name,
-                                   contactmethod, description, status,
-                                   is_deleted, created_date, commit=False)
+            self.dbConn.setRequest(**self.fakeRequest(), commit=False)
         db.session.commit()
 
     def loadImage(self, db, num_rows=20):
@@ -359,13 +2330,7 @@ class MockData:
         '''
 
         for i in range(num_rows):
-            name = self.fake.word()
-            description = self.fakeDescription()
-            filename = self.fake.file_path()
-            created_date = self.fakeDate()
-
-            self.dbConn.setImage(name, description, filename,
-                                 created_date, commit=False)
+            self.dbConn.setImage(**self.fakeImage(), commit=False)
         db.session.commit()
 
     def loadLayout(self, db, num_rows=30):
@@ -374,15 +2339,7 @@ class MockData:
         '''
 
         for i in range(num_rows):
-            endpoint = self.fake.uri_path()
-            content_name = self.fake.word()
-            content = self.fakeDescription(2, 3)
-            is_image = self.fake.boolean()
-            created_date = self.fakeDate()
-
-            self.dbConn.setLayout(endpoint, content_name, content,
-                                  is_image, created_date,
-                                  commit=False)
+            self.dbConn.setLayout(**self.fakeLayout(), commit=False)
         db.session.commit()
 
     def loadContact(self, db, num_rows=20):
@@ -391,14 +2348,129 @@ class MockData:
         '''
 
         for i in range(num_rows):
-            emailaddress = self.fake.email()
-            name = self.fake.name()
-            content = self.fakeDescription()
-            status = self.fake.random_element([
-                'unread', 'read',
-            ])
-            created_date = self.fakeDate()
+            self.dbConn.setContact(**self.fakeContact(), commit=False)
+        db.session.commit()
+
+    def fakeBatch(self, table, offset, num_rows, fast_hash=False,
+                  fields=None):
+        '''
+        Generate a batch of fake rows for the given table. Unique columns
+        are suffixed with the row's position so that batches generated in
+        parallel, or by earlier runs, never collide. Column values in
+        `fields` are set on every row
+        '''
+        import flask_bcrypt
+
+        # forked processes share the parent's random state
+        self.fake.seed_instance(offset)
+        rounds = 4 if fast_hash else None
+        fakeRow = getattr(self, f'fake{table.capitalize()}')
+
+        rows = []
+        for i in range(offset, offset + num_rows):
+            row = fakeRow()
+            if table == 'admin':
+                row['username'] = f"{row['username']}_{i}"
+                row['password'] = flask_bcrypt.generate_password_hash(
+                    row['password'], rounds).decode('utf-8')
+            elif table == 'image':
+                row['filename'] = f"{i}_{row['filename']}"
+            row.update(fields or {})
+            rows.append(row)
+        return rows
+
+    def bulkLoad(self, db, table, num_rows, batch_size=5000, processes=1,
+                 fast_hash=False, fields=None):
+        '''
+        Load a table with large amounts of fake data. Rows are generated
+        in batches, optionally across multiple processes, and written
+        with COPY on Postgres or executemany elsewhere. Column values in
+        `fields` are set on every row
+
+        Returns:
+            Number of rows per second written
+        '''
+        from sqlalchemy import func
+
+        model = self.dbConn.getModel(table)
+        # positions continue past the highest existing id, so rows seeded
+        # by earlier runs (whose positions are always below their ids)
+        # never share a unique suffix with this run's
+        base = db.session.query(func.max(model.id)).scalar() or 0
+        batches = [
+            (table, base + offset, min(batch_size, num_rows - offset),
+             fast_hash, fields)
+            for offset in range(0, num_rows, batch_size)
+        ]
+
+        start = time.perf_counter()
+        if processes > 1:
+            from multiprocessing import Pool
+
+            with Pool(processes) as pool:
+                for rows in pool.imap_unordered(_fakeBatch, batches):
+                    self.writeBatch(db, model, rows)
+        else:
+            for batch in batches:
+                self.writeBatch(db, model, self.fakeBatch(*batch))
+        elapsed = time.perf_counter() - start
+
+        rate = num_rows / elapsed if elapsed else num_rows
+        self.dbConn.logger.log(
+            f'Loaded {num_rows} {table} rows in {elapsed:.1f}s '
+            f'({rate:.0f} rows/s)'
+        )
+        return rate
 
-            self.dbConn.setContact(emailaddress, name, content, status,
-                                   created_date, commit=False)
+    def writeBatch(self, db, model, rows):
+        '''
+        Write a batch of row dictionaries to the model's table, along with
+        their rollups, and commit
+        '''
+        if not rows:
+            return
+
+        if db.session.bind.dialect.name == 'postgresql':
+            import csv
+            import io
+
+            columns = list(rows[0].keys())
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([row[column] for column in columns])
+            buffer.seek(0)
+
+            cursor = db.session.connection().connection.cursor()
+            cursor.copy_expert(
+                f'COPY {model.__tablename__} ({", ".join(columns)}) '
+                'FROM STDIN WITH CSV',
+                buffer
+            )
+        else:
+            db.session.bulk_insert_mappings(model, rows)
+        if model.__tablename__ in ('request', 'contact'):
+            self.recordRollups(model.__tablename__, rows)
         db.session.commit()
+
+    def recordRollups(self, table, rows):
+        '''
+        Adds a batch of request or contact rows to the rollups, one
+        increment per day and status rather than per row, since bulk
+        loads skip DbConnector
+        '''
+        rollups = self.dbConn.rollups
+        created = Counter(row['created_date'] for row in rows)
+        statuses = Counter((row['created_date'], row['status'])
+                           for row in rows)
+        for day, count in created.items():
+            rollups.increment(day, table, 'created', count=count)
+        for (day, status), count in statuses.items():
+            rollups.increment(day, table, 'status', status, count=count)
+
+
+def _fakeBatch(batch):
+    '''
+    Generates a batch of fake rows inside a worker process
+    '''
+    return MockData().fakeBatch(*batch)
@@ -4,9 +4,11 @@
 # Forms to be used by flask_wtf to render and handle form data
 # ------------------------------------------------------------
 
+from uuid import uuid4
+
 from flask_wtf import FlaskForm
-from wtforms import (PasswordField, SelectField, StringField, SubmitField,
-                     TextAreaField)
+from wtforms import (HiddenField, PasswordField, SelectField, StringField,
+                     SubmitField, TextAreaField)
 from wtforms.validators import (DataRequired, Email, EqualTo, Length, Optional,
                                 Regexp, ValidationError)
 
@@ -49,6 +51,10 @@ def secret_code_check(form, field):
         raise ValidationError('Incorrect secret code')
 
 
+def idempotency_key():
+    return uuid4().hex
+
+
 class RequestForm(FlaskForm):
     '''
     A request form for users to request a custom design.
@@ -57,15 +63,18 @@ class RequestForm(FlaskForm):
     email = StringField('Your Email', validators=[
         email_or_phone,
         Optional(),
-        Email()
+        Email(),
+        Length(max=64)
     ])
 
     phone = StringField('Your Phone Number', validators=[
-        email_or_phone
+        email_or_phone,
+        Length(max=80)
     ])
 
     name = StringField('Your Name', validators=[
         DataRequired(),
+        Length(max=80)
     ])
 
     contact_method = SelectField('Your Preferred Contact Method', choices=[
@@ -83,6 +92,11 @@ class RequestForm(FlaskForm):
                                     ]
                                 )
 
+    idempotency_key = HiddenField(default=idempotency_key, validators=[
+        Optional(),
+        Length(max=64)
+    ])
+
     submit = SubmitField('Request')
 
 
@@ -93,12 +107,14 @@ class ContactForm(FlaskForm):
     '''
 
     name = StringField('Your Name', validators=[
-        DataRequired()
+        DataRequired(),
+        Length(max=80)
     ])
 
     email = StringField('Your Email', validators=[
         DataRequired(),
-        Email()
+        Email(),
+        Length(max=64)
     ])
 
     content = TextAreaField('Question', validators=[
@@ -106,6 +122,11 @@ class ContactForm(FlaskForm):
         Length(min=25, max=2500, message="Must contain at least 25 characters")
     ])
 
+    idempotency_key = HiddenField(default=idempotency_key, validators=[
+        Optional(),
+        Length(max=64)
+    ])
+
     submit = SubmitField('Send')
 
 
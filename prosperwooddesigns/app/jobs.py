@@ -0,0 +1,79 @@
+# jobs.py
+# Michael Cole
+#
+# Location of all scheduled jobs
+# ------------------------------
+
+from .extensions import DbConnector, LogArchive, Logger
+
+logger = Logger()
+dbConn = DbConnector()
+logArchive = LogArchive()
+
+
+class Jobs:
+    '''
+    Jobs object registers all periodic jobs with the app's scheduler
+
+    Use:
+        jobs = Jobs()
+        jobs.init(app, scheduler)
+    '''
+
+    def init(self, app, scheduler):
+        '''
+        Registers the periodic jobs enabled by the app's config
+        '''
+
+        if app.config['AWS_DOWNLOAD_IMAGES'] and \
+                app.config['IMAGE_SERVING'] != 's3':
+            # every container serves its own copy of the images
+            @scheduler.job('sync-images', '*/30 * * * *', scope='host')
+            def sync_images():
+                '''
+                Downloads new images from S3 and computes their
+                placeholders
+                '''
+                from . import s3Conn, startupState
+
+                startupState.syncImages(s3Conn)
+
+        if app.config['LOG_TO_FILE'] and app.config['LOG_COMPRESS']:
+            # every container writes its own log files
+            @scheduler.job('rotate-logs', '5 0 * * *', scope='host')
+            def rotate_logs():
+                '''
+                Compresses the log files of previous days
+                '''
+                count = logArchive.rotate()
+                logger.log(f'Compressed {count} log files')
+
+        if app.config['FREEZE_ENABLED']:
+            # every container freezes pages into its own nginx volume.
+            # Changes committed by this container re-freeze right away,
+            # while this job catches changes made by other containers
+            @scheduler.job('freeze', '*/10 * * * *', scope='host')
+            def freeze():
+                '''
+                Re-freezes the public pages if the Image or Layout rows
+                they depend on have changed
+                '''
+                from . import freezer
+
+                freezer.freeze(ifChanged=True)
+
+        @scheduler.job('archive', '0 3 * * *')
+        def archive():
+            '''
+            Moves old completed or deleted requests and read contacts into
+            the archive tables
+            '''
+            dbConn.archive(app.config['ARCHIVE_AFTER_DAYS'])
+
+        @scheduler.job('prune-job-runs', '30 3 * * *')
+        def prune_job_runs():
+            '''
+            Deletes the history of old job runs
+            '''
+            count = scheduler.prune(app.config['SCHEDULER_HISTORY_DAYS'])
+            logger.log(f'Pruned {count} job runs')
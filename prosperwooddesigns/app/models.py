@@ -4,21 +4,101 @@
 # Database models for consumption by SQLAlchemy
 # ---------------------------------------------
 
-from datetime import datetime
+import time
+from itertools import count
 
+from flask import has_request_context, session
 from flask_login import LoginManager
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import Select
+
+from .extensions import Logger, clock
+
+
+class RoutingSession(SignallingSession):
+    '''
+    Session that sends read-only queries to the configured read replicas
+    in round-robin and everything else to the primary. Once a session
+    has written, and for DB_REPLICA_STICKY_SECONDS after a user's commit,
+    reads go to the primary so that users always see their own writes
+    '''
+
+    def __init__(self, db, **options):
+        super().__init__(db, **options)
+        self.db = db
+        self.wrote = False
+        event.listen(self, 'after_transaction_end', self._endTransaction)
+
+    def _endTransaction(self, session, transaction):
+        # sessions outlive their transactions in long-running threads such
+        # as the intake committer, so a write only pins the rest of its
+        # own transaction to the primary
+        if transaction.parent is None:
+            self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing:
+            self.wrote = True
+        if not self.app.config['SQLALCHEMY_REPLICA_BINDS'] or \
+                self.wrote or not isinstance(clause, Select) or \
+                self.recentlyWrote():
+            return super().get_bind(mapper, clause)
+        return self.db.getReplicaEngine(self.app)
+
+    def recentlyWrote(self):
+        if not has_request_context():
+            return False
+        wroteAt = session.get('dbWroteAt', 0)
+        return time.time() - wroteAt < \
+            self.app.config['DB_REPLICA_STICKY_SECONDS']
+
+    def commit(self):
+        wrote = self.wrote or self.new or self.dirty or self.deleted
+        super().commit()
+        if wrote and has_request_context() and \
+                self.app.config['SQLALCHEMY_REPLICA_BINDS']:
+            session['dbWroteAt'] = time.time()
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    '''
+    SQLAlchemy extension using RoutingSession for read/write splitting
+    '''
+
+    replicaCounter = count()
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def getReplicaEngine(self, app):
+        '''
+        Returns the next read replica's engine in round-robin
+        '''
+        binds = app.config['SQLALCHEMY_REPLICA_BINDS']
+        bind = binds[next(self.replicaCounter) % len(binds)]
+        return self.get_engine(app, bind=bind)
 
-from .extensions import Logger
 
 logger = Logger()
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 loginManager = LoginManager()
 
+# full-text search documents kept in generated search_vector columns
+REQUEST_SEARCH_VECTOR = (
+    "to_tsvector('english', coalesce(name, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(emailaddress, ''))"
+)
+CONTACT_SEARCH_VECTOR = (
+    "to_tsvector('english', coalesce(name, '') || ' ' || "
+    "coalesce(content, '') || ' ' || coalesce(emailaddress, ''))"
+)
+
 
 @loginManager.user_loader
 def load_user(admin_id):
-    return Admin.query.filter_by(id=admin_id).first()
+    return Admin.query.get(int(admin_id))
 
 
 class Admin(db.Model):
@@ -58,13 +138,13 @@ class Admin(db.Model):
 
     def __init__(
         self, username, password, firstname,
-        lastname, created_date=datetime.now()
+        lastname, created_date=None
     ):
         self.username = username
         self.password = password
         self.firstname = firstname
         self.lastname = lastname
-        self.created_date = created_date
+        self.created_date = created_date or clock.now().date()
 
     def __repr__(self):
         return f'Admin: @{self.username} ({self.firstname} {self.lastname})'
@@ -131,10 +211,28 @@ class Request(db.Model):
         unique=False,
         nullable=False
     )
+    search_vector = db.Column(
+        TSVECTOR,
+        db.Computed(REQUEST_SEARCH_VECTOR, persisted=True)
+    )
+    idempotency_key = db.Column(
+        db.String(64),
+        unique=True,
+        nullable=True
+    )
+
+    __table_args__ = (
+        db.Index('ix_request_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        # most reads skip soft-deleted requests
+        db.Index('ix_request_live_created_date', 'created_date',
+                 postgresql_where=db.text('NOT is_deleted')),
+    )
 
     def __init__(
         self, emailaddress, phonenumber, name, contactmethod,
-        description, status, is_deleted=False, created_date=datetime.now()
+        description, status, is_deleted=False, created_date=None,
+        idempotency_key=None
     ):
         self.emailaddress = emailaddress
         self.phonenumber = phonenumber
@@ -143,7 +241,8 @@ class Request(db.Model):
         self.description = description
         self.status = status
         self.is_deleted = is_deleted
-        self.created_date = created_date
+        self.created_date = created_date or clock.now().date()
+        self.idempotency_key = idempotency_key
 
     def __repr__(self):
         return f'Request: {self.name} - {self.emailaddress} ({self.status})'
@@ -178,14 +277,33 @@ class Image(db.Model):
         unique=False,
         nullable=False
     )
+    placeholder = db.Column(
+        db.Text,
+        unique=False,
+        nullable=True
+    )
+    width = db.Column(
+        db.Integer,
+        unique=False,
+        nullable=True
+    )
+    height = db.Column(
+        db.Integer,
+        unique=False,
+        nullable=True
+    )
 
     def __init__(
-        self, name, description, filename, created_date=datetime.now()
+        self, name, description, filename, created_date=None,
+        placeholder=None, width=None, height=None
     ):
         self.name = name
         self.description = description
         self.filename = filename
-        self.created_date = created_date
+        self.created_date = created_date or clock.now().date()
+        self.placeholder = placeholder
+        self.width = width
+        self.height = height
 
     def __repr__(self):
         return f'Image: {self.name}'
@@ -228,13 +346,13 @@ class Layout(db.Model):
 
     def __init__(
         self, endpoint, content_name, content,
-        is_image, created_date=datetime.now()
+        is_image, created_date=None
     ):
         self.endpoint = endpoint
         self.content_name = content_name
         self.content = content
         self.is_image = is_image
-        self.created_date = created_date
+        self.created_date = created_date or clock.now().date()
 
     def __repr__(self):
         return f'Layout: {self.endpoint} - {self.content_name}'
@@ -274,16 +392,295 @@ class Contact(db.Model):
         unique=False,
         nullable=False
     )
+    search_vector = db.Column(
+        TSVECTOR,
+        db.Computed(CONTACT_SEARCH_VECTOR, persisted=True)
+    )
+    idempotency_key = db.Column(
+        db.String(64),
+        unique=True,
+        nullable=True
+    )
+
+    __table_args__ = (
+        db.Index('ix_contact_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+    )
 
     def __init__(
         self, emailaddress, name, content, status,
-        created_date=datetime.now()
+        created_date=None, idempotency_key=None
     ):
         self.emailaddress = emailaddress
         self.name = name
         self.content = content
         self.status = status
-        self.created_date = created_date
+        self.created_date = created_date or clock.now().date()
+        self.idempotency_key = idempotency_key
 
     def __repr__(self):
         return f'Contact: {self.name} - {self.emailaddress} ({self.status})'
+
+
+class RequestArchive(db.Model):
+    '''
+    Data model for archived Requests
+    '''
+
+    __tablename__ = 'request_archive'
+
+    id = db.Column(
+        db.Integer,
+        primary_key=True,
+        autoincrement=False
+    )
+    emailaddress = db.Column(
+        db.String(64),
+        nullable=False
+    )
+    phonenumber = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    name = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    contactmethod = db.Column(
+        db.String(80),
+        nullable=True
+    )
+    description = db.Column(
+        db.Text,
+        nullable=True
+    )
+    status = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    is_deleted = db.Column(
+        db.Boolean,
+        nullable=False
+    )
+    created_date = db.Column(
+        db.Date,
+        nullable=False
+    )
+    idempotency_key = db.Column(
+        db.String(64),
+        nullable=True
+    )
+    archived_date = db.Column(
+        db.Date,
+        nullable=False,
+        server_default=db.func.current_date()
+    )
+
+    def __repr__(self):
+        return f'RequestArchive: {self.name} - {self.emailaddress}'
+
+
+class ContactArchive(db.Model):
+    '''
+    Data model for archived Contacts
+    '''
+
+    __tablename__ = 'contact_archive'
+
+    id = db.Column(
+        db.Integer,
+        primary_key=True,
+        autoincrement=False
+    )
+    emailaddress = db.Column(
+        db.String(64),
+        nullable=False
+    )
+    name = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    content = db.Column(
+        db.Text,
+        nullable=True
+    )
+    status = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    created_date = db.Column(
+        db.Date,
+        nullable=False
+    )
+    idempotency_key = db.Column(
+        db.String(64),
+        nullable=True
+    )
+    archived_date = db.Column(
+        db.Date,
+        nullable=False,
+        server_default=db.func.current_date()
+    )
+
+    def __repr__(self):
+        return f'ContactArchive: {self.name} - {self.emailaddress}'
+
+
+class DailyRollup(db.Model):
+    '''
+    Data model for daily aggregates of request and contact activity
+    '''
+
+    __tablename__ = 'daily_rollup'
+
+    day = db.Column(
+        db.Date,
+        primary_key=True
+    )
+    table = db.Column(
+        db.String(16),
+        primary_key=True
+    )
+    metric = db.Column(
+        db.String(32),
+        primary_key=True
+    )
+    bucket = db.Column(
+        db.String(32),
+        primary_key=True
+    )
+    count = db.Column(
+        db.Integer,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return (f'DailyRollup: {self.day} {self.table} {self.metric} '
+                f'{self.bucket} ({self.count})')
+
+
+class JobRun(db.Model):
+    '''
+    Data model for one run of a scheduled job. A job runs at most once
+    per scheduled minute, per host for host-scoped jobs
+    '''
+
+    __tablename__ = 'job_run'
+    __table_args__ = (
+        db.UniqueConstraint('name', 'host', 'scheduled_for'),
+    )
+
+    id = db.Column(
+        db.Integer,
+        primary_key=True
+    )
+    name = db.Column(
+        db.String(80),
+        nullable=False
+    )
+    # empty for jobs run once across every host
+    host = db.Column(
+        db.String(80),
+        nullable=False,
+        default=''
+    )
+    scheduled_for = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False
+    )
+    started_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False
+    )
+    finished_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=True
+    )
+    duration_ms = db.Column(
+        db.Integer,
+        nullable=True
+    )
+    # running, success, failed or abandoned
+    status = db.Column(
+        db.String(20),
+        nullable=False
+    )
+    error = db.Column(
+        db.Text,
+        nullable=True
+    )
+    worker = db.Column(
+        db.String(80),
+        nullable=False
+    )
+
+    def __repr__(self):
+        return (f'JobRun: {self.name} {self.scheduled_for} '
+                f'({self.status})')
+
+
+# columns moved from the hot tables into their archive tables
+ARCHIVED_COLUMNS = {
+    'request': [column.key for column in RequestArchive.__table__.columns
+                if column.key != 'archived_date'],
+    'contact': [column.key for column in ContactArchive.__table__.columns
+                if column.key != 'archived_date'],
+}
+
+
+def upgradeSchema():
+    '''
+    Adds the columns and indexes introduced after the request, contact and
+    image tables were first created. The catalog is checked first, so
+    nothing is altered (or locked) once the schema is up to date
+    '''
+    if db.engine.dialect.name != 'postgresql':
+        return
+    from sqlalchemy import inspect
+
+    inspector = inspect(db.engine)
+    columns = {
+        table: {column['name'] for column in inspector.get_columns(table)}
+        for table in ('request', 'contact', 'image')
+    }
+    indexes = {
+        index['name']
+        for table in ('request', 'contact')
+        for index in inspector.get_indexes(table)
+    }
+
+    statements = []
+    for table, vector in (('request', REQUEST_SEARCH_VECTOR),
+                          ('contact', CONTACT_SEARCH_VECTOR)):
+        if 'search_vector' not in columns[table]:
+            statements.append(
+                f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS '
+                f'search_vector tsvector GENERATED ALWAYS AS ({vector}) '
+                'STORED'
+            )
+        if f'ix_{table}_search_vector' not in indexes:
+            statements.append(
+                f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector '
+                f'ON {table} USING gin (search_vector)'
+            )
+        if 'idempotency_key' not in columns[table]:
+            statements.append(
+                f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS '
+                'idempotency_key VARCHAR(64) UNIQUE'
+            )
+    for column, type in (('placeholder', 'TEXT'), ('width', 'INTEGER'),
+                         ('height', 'INTEGER')):
+        if column not in columns['image']:
+            statements.append(
+                f'ALTER TABLE image ADD COLUMN IF NOT EXISTS {column} {type}'
+            )
+    if 'ix_request_live_created_date' not in indexes:
+        statements.append(
+            'CREATE INDEX IF NOT EXISTS ix_request_live_created_date '
+            'ON request (created_date) WHERE NOT is_deleted'
+        )
+
+    for statement in statements:
+        db.session.execute(statement)
+    if statements:
+        db.session.commit()
@@ -4,15 +4,21 @@
 # Location of all app routing
 # ---------------------------
 
-from flask import redirect, render_template, request, url_for
+from flask import (Response, abort, current_app, jsonify, redirect,
+                   render_template, request, send_from_directory,
+                   stream_with_context, url_for)
 
 from flask_login import login_required, login_user, logout_user
 
-from .extensions import DbConnector, Helper, Logger
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import DbConnector, DedupCache, Exporter, Helper, Logger
 
 logger = Logger()
 dbConn = DbConnector()
 helper = Helper()
+exporter = Exporter()
+dedupCache = DedupCache()
 
 
 class Routes:
@@ -73,10 +79,23 @@ class Routes:
                 name = request.form['name']
                 contact_method = request.form['contact_method']
                 description = request.form['description']
-
-                dbConn.setRequest(
-                    email, phone, name, contact_method, description
-                )
+                key = requestform.idempotency_key.data or None
+
+                if key and dedupCache.get(key):
+                    logger.log(f'Request {key} already submitted')
+                else:
+                    # committed right away, as the key may only be
+                    # remembered once the request is stored for good
+                    try:
+                        dbConn.setRequest(
+                            email, phone, name, contact_method, description,
+                            idempotency_key=key, commit=True
+                        )
+                    except IntegrityError:
+                        dbConn.db.session.rollback()
+                        logger.log(f'Request {key} already submitted')
+                    if key:
+                        dedupCache.add(key)
 
                 logger.log('Redirecting to request form success page')
                 return redirect(url_for('request_success'))
@@ -110,8 +129,21 @@ class Routes:
                 name = request.form['name']
                 email = request.form['email']
                 content = request.form['content']
-
-                dbConn.setContact(email, name, content)
+                key = contactform.idempotency_key.data or None
+
+                if key and dedupCache.get(key):
+                    logger.log(f'Contact {key} already submitted')
+                else:
+                    # committed right away, as the key may only be
+                    # remembered once the contact is stored for good
+                    try:
+                        dbConn.setContact(email, name, content,
+                                          idempotency_key=key, commit=True)
+                    except IntegrityError:
+                        dbConn.db.session.rollback()
+                        logger.log(f'Contact {key} already submitted')
+                    if key:
+                        dedupCache.add(key)
 
                 logger.log('Redirecting to contact form success page')
                 return redirect(url_for('contact_success'))
@@ -131,6 +163,122 @@ class Routes:
             return render_template('contact_success.html',
                                    title='Contact Success')
 
+        @app.route('/api/requestform', methods=['POST'])
+        def api_requestform():
+            '''
+            Validates a JSON request submission and queues it to be
+            committed in the background
+            '''
+            from . import intakeQueue
+            from .forms import RequestForm
+
+            if not current_app.config['INTAKE_QUEUE_ENABLED']:
+                abort(404)
+            if not request.is_json:
+                abort(415)
+            requestform = RequestForm(meta={'csrf': False})
+            if not requestform.validate():
+                return jsonify(errors=requestform.errors), 400
+
+            key = requestform.idempotency_key.data
+            id = dedupCache.get(key)
+            if id is not None:
+                logger.log(f'Request {key} already queued as {id}')
+                return jsonify(status='queued', id=id), 202
+
+            id = intakeQueue.put('request', {
+                'emailaddress': requestform.email.data,
+                'phonenumber': requestform.phone.data,
+                'name': requestform.name.data,
+                'contactmethod': requestform.contact_method.data,
+                'description': requestform.description.data,
+                'idempotency_key': key,
+            })
+            dedupCache.add(key, id)
+
+            logger.log(f'Queued request submission {id}')
+            return jsonify(status='queued', id=id), 202
+
+        @app.route('/api/contact', methods=['POST'])
+        def api_contact():
+            '''
+            Validates a JSON contact submission and queues it to be
+            committed in the background
+            '''
+            from . import intakeQueue
+            from .forms import ContactForm
+
+            if not current_app.config['INTAKE_QUEUE_ENABLED']:
+                abort(404)
+            if not request.is_json:
+                abort(415)
+            contactform = ContactForm(meta={'csrf': False})
+            if not contactform.validate():
+                return jsonify(errors=contactform.errors), 400
+
+            key = contactform.idempotency_key.data
+            id = dedupCache.get(key)
+            if id is not None:
+                logger.log(f'Contact {key} already queued as {id}')
+                return jsonify(status='queued', id=id), 202
+
+            id = intakeQueue.put('contact', {
+                'emailaddress': contactform.email.data,
+                'name': contactform.name.data,
+                'content': contactform.content.data,
+                'idempotency_key': key,
+            })
+            dedupCache.add(key, id)
+
+            logger.log(f'Queued contact submission {id}')
+            return jsonify(status='queued', id=id), 202
+
+        @app.route('/healthz')
+        def healthz():
+            '''
+            Cheap liveness check that never touches the database
+            '''
+            from . import startupState
+            return jsonify(status='alive', startup=startupState.state)
+
+        @app.route('/readyz')
+        def readyz():
+            '''
+            Readiness check. Only returns 200 once startup has finished,
+            images are synced and the database answers through the pool
+            '''
+            import os
+            from . import startupState
+
+            imagePath = current_app.config['AWS_LOCAL_IMAGE_PATH']
+            if current_app.config['IMAGE_SERVING'] == 's3':
+                # images are loaded by the browser straight from S3
+                images = True
+            elif current_app.config['AWS_DOWNLOAD_IMAGES']:
+                # by default, images are downloaded in production by
+                # `flask sync-images` before the server starts and then
+                # kept fresh by the sync-images job, in other processes
+                # than this worker, so the directory itself is checked
+                images = startupState.hasImages(imagePath)
+            else:
+                images = os.path.isdir(imagePath)
+
+            checks = {
+                'started': startupState.started,
+                'images': images,
+            }
+            try:
+                dbConn.db.session.execute('SELECT 1')
+                checks['db'] = True
+            except Exception:
+                dbConn.db.session.rollback()
+                checks['db'] = False
+
+            ready = all(checks.values())
+            return jsonify(status='ready' if ready else 'not ready',
+                           startup=startupState.state,
+                           checks=checks), 200 if ready else 503
+
         @app.route('/admin')
         @login_required
         def admin():
@@ -140,13 +288,17 @@ class Routes:
             greeting = helper.getGreeting()
             requests = dbConn.getRequests(order_date=True)
             contacts = dbConn.getContacts(order_date=True)
+            requestCounts = dbConn.getStatusCounts('request')
+            contactCounts = dbConn.getStatusCounts('contact')
 
             logger.log('Serving admin page')
             return render_template('admin.html',
                                    title='Admin',
                                    greeting=greeting,
                                    requests=requests,
-                                   contacts=contacts)
+                                   contacts=contacts,
+                                   requestCounts=requestCounts,
+                                   contactCounts=contactCounts)
 
         @app.route('/admin/log-in', methods=['GET', 'POST'])
         def admin_login():
@@ -224,7 +376,8 @@ class Routes:
             Updated a request's status based on modal input
             '''
             new_status = request.form[f'request-{request_id}']
-            dbConn.updateRequest(id=request_id, status=new_status)
+            if dbConn.updateRequest(id=request_id, status=new_status) is None:
+                abort(404)
 
             logger.log('Redirecting to admin page')
             return redirect(url_for('admin'))
@@ -236,31 +389,118 @@ class Routes:
             Updated a contact's status based on modal input
             '''
             new_status = request.form[f'contact-{contact_id}']
-            dbConn.updateContact(id=contact_id, status=new_status)
+            if dbConn.updateContact(id=contact_id, status=new_status) is None:
+                abort(404)
 
             logger.log('Redirecting to admin page')
             return redirect(url_for('admin'))
 
-        @app.route('/admin/data')
-        def data():
+        @app.route('/admin/profiles/<filename>')
+        @login_required
+        def admin_profiles_filename(filename):
             '''
-            Routes the user to the Data Page of the website
+            Downloads a profile captured by the request profiler
             '''
-            from .extensions import DbConnector
+            logger.log(f'Serving profile {filename}')
+            return send_from_directory(
+                current_app.config['PROFILER_OUTPUT_DIR'], filename,
+                as_attachment=True)
 
-            dbConnector = DbConnector()
+        @app.route('/admin/data/<table>.<format>')
+        @login_required
+        def data_export(table, format):
+            '''
+            Streams a full table as a CSV or NDJSON download
+            '''
+            if table not in ('admin', 'request', 'image', 'layout',
+                             'contact') or format not in exporter.formats:
+                abort(404)
+
+            logger.log(f'Exporting {table} table as {format}')
+            # password hashes never leave the database
+            exclude = ('password',) if table == 'admin' else ()
+            return Response(
+                stream_with_context(
+                    exporter.export(table, format, exclude=exclude)),
+                mimetype=exporter.formats[format],
+                headers={'Content-Disposition':
+                         f'attachment; filename={table}.{format}',
+                         # stream straight through nginx's proxy buffers
+                         'X-Accel-Buffering': 'no'}
+            )
+
+        @app.route('/admin/data/<table>/rows')
+        @login_required
+        def data_rows(table):
+            '''
+            Serves a single page of a table as JSON for the data tables
+            '''
+            if table not in ('admin', 'request', 'image', 'layout',
+                             'contact'):
+                abort(404)
+
+            total, rows = dbConn.getPage(
+                table,
+                limit=request.args.get('limit', 10, type=int),
+                offset=request.args.get('offset', 0, type=int),
+                sort=request.args.get('sort'),
+                order=request.args.get('order', 'asc'),
+                search=request.args.get('search'),
+                exclude=('password',)
+            )
+            for row in rows:
+                row['created_date'] = row['created_date'].isoformat()
+                if table == 'admin':
+                    row['password'] = 'RESTRICTED'
+
+            logger.log(f'Serving {table} data rows')
+            return jsonify(total=total, rows=rows)
+
+        @app.route('/admin/rollups')
+        @login_required
+        def admin_rollups():
+            '''
+            Serves request or contact trends as JSON, read only from the
+            daily rollups
+            '''
+            table = request.args.get('table', 'request')
+            if table not in ('request', 'contact'):
+                abort(404)
 
-            admins = dbConnector.getAdmins()
-            requests = dbConnector.getRequests()
-            images = dbConnector.getImages()
-            layouts = dbConnector.getLayouts()
-            contacts = dbConnector.getContacts()
+            logger.log(f'Serving {table} rollups')
+            return jsonify(dbConn.rollups.getDashboard(
+                table, weeks=request.args.get('weeks', 12, type=int)
+            ))
 
+        @app.route('/admin/search')
+        @login_required
+        def admin_search():
+            '''
+            Serves ranked full-text search results over requests or
+            contacts as JSON
+            '''
+            table = request.args.get('table', 'request')
+            text = request.args.get('q', '')
+            if table not in ('request', 'contact'):
+                abort(404)
+
+            total, rows = dbConn.search(
+                table, text,
+                limit=request.args.get('limit', 10, type=int),
+                offset=request.args.get('offset', 0, type=int)
+            )
+            for row in rows:
+                row['created_date'] = row['created_date'].isoformat()
+
+            logger.log(f'Serving {table} search results for "{text}"')
+            return jsonify(total=total, rows=rows)
+
+        @app.route('/admin/data')
+        def data():
+            '''
+            Routes the user to the Data Page of the website. Each table is
+            loaded on demand from data_rows
+            '''
             logger.log('Serving admin data page')
             return render_template('data.html',
-                                   title='Data',
-                                   admins=admins,
-                                   requests=requests,
-                                   images=images,
-                                   layouts=layouts,
-                                   contacts=contacts)
+                                   title='Data')
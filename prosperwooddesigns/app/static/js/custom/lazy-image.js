@@ -0,0 +1,34 @@
+// lazy-image.js
+// Michael Cole
+//
+// Swaps each placeholder for its real image as it nears the viewport
+
+(function () {
+    var images = document.querySelectorAll('img.lazy-image[data-src]');
+
+    function load(image) {
+        image.addEventListener('load', function () {
+            image.classList.remove('lazy-image');
+        });
+        image.src = image.getAttribute('data-src');
+        image.removeAttribute('data-src');
+    }
+
+    if (!('IntersectionObserver' in window)) {
+        Array.prototype.forEach.call(images, load);
+        return;
+    }
+
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                load(entry.target);
+            }
+        });
+    }, { rootMargin: '200px 0px' });
+
+    Array.prototype.forEach.call(images, function (image) {
+        observer.observe(image);
+    });
+})();
@@ -0,0 +1,456 @@
+# benchmark.py
+# Michael Cole
+#
+# Benchmark and load-test harness for the public and admin routes
+# ---------------------------------------------------------------
+#
+# Run from inside the app container so that Postgres is reachable:
+#
+#   docker-compose exec flask python benchmark.py --scale 10000
+#
+# Results are printed as JSON (or written to --output) so they can be
+# compared against a previous baseline.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_ADMIN_USERNAME = 'benchadmin'
+BENCH_ADMIN_PASSWORD = 'Bench!Admin1'
+BENCH_PROFILE = 'benchmark.prof'
+
+REQUEST_FORM = {
+    'email': 'bench@example.com',
+    'phone': '555-555-5555',
+    'name': 'Bench Mark',
+    'contact_method': 'email',
+    'description': 'A benchmark request with a long enough description.',
+}
+
+CONTACT_FORM = {
+    'name': 'Bench Mark',
+    'email': 'bench@example.com',
+    'content': 'A benchmark question with a long enough description.',
+}
+
+LOGIN_FORM = {
+    'username': BENCH_ADMIN_USERNAME,
+    'password': BENCH_ADMIN_PASSWORD,
+}
+
+
+def jsonBody(form):
+    '''
+    Sends a form as a JSON body instead. Each submission gets a fresh
+    idempotency key from the form's default, so every one is queued
+    '''
+    return lambda: {'json': form}
+
+
+def createForm():
+    '''
+    Admin create form for a new admin on every request
+    '''
+    return {'data': {
+        'firstname': 'Bench',
+        'lastname': 'Admin',
+        'username': f'bench{uuid.uuid4().hex[:12]}',
+        'password': BENCH_ADMIN_PASSWORD,
+        'password_retype': BENCH_ADMIN_PASSWORD,
+        'secret_code': os.environ.get('ADMIN_FORM_SECRET_CODE', ''),
+    }}
+
+
+# (name, method, url, form data, requires admin log-in). Data is either
+# a form or a function returning the arguments of each request
+SCENARIOS = [
+    ('healthz', 'GET', '/healthz', None, False),
+    ('readyz', 'GET', '/readyz', None, False),
+    ('index', 'GET', '/', None, False),
+    ('designs', 'GET', '/designs', None, False),
+    ('requestform', 'GET', '/requestform', None, False),
+    ('requestform_post', 'POST', '/requestform', REQUEST_FORM, False),
+    ('request_success', 'GET', '/request/success', None, False),
+    ('contact', 'GET', '/contact', None, False),
+    ('contact_post', 'POST', '/contact', CONTACT_FORM, False),
+    ('contact_success', 'GET', '/contact/success', None, False),
+    ('api_requestform', 'POST', '/api/requestform', jsonBody(REQUEST_FORM),
+     False),
+    ('api_contact', 'POST', '/api/contact', jsonBody(CONTACT_FORM), False),
+    ('admin_login', 'GET', '/admin/log-in', None, False),
+    ('admin_login_post', 'POST', '/admin/log-in', LOGIN_FORM, False),
+    ('admin_create', 'GET', '/admin/create', None, False),
+    ('admin_create_post', 'POST', '/admin/create', createForm, False),
+    ('admin', 'GET', '/admin', None, True),
+    ('admin_request_requestid', 'POST', '/admin/request/1',
+     {'request-1': 'read'}, True),
+    ('admin_contact_contactid', 'POST', '/admin/contact/1',
+     {'contact-1': 'read'}, True),
+    ('data', 'GET', '/admin/data', None, True),
+    ('data_rows', 'GET', '/admin/data/request/rows?limit=10&offset=0',
+     None, True),
+    ('data_rows_search', 'GET',
+     '/admin/data/request/rows?limit=10&offset=0&search=bench', None, True),
+    ('data_export_csv', 'GET', '/admin/data/request.csv', None, True),
+    ('data_export_ndjson', 'GET', '/admin/data/contact.ndjson', None, True),
+    ('admin_rollups', 'GET', '/admin/rollups?table=request', None, True),
+    ('admin_search', 'GET', '/admin/search?table=request&q=wood', None,
+     True),
+    ('admin_profiles_filename', 'GET', f'/admin/profiles/{BENCH_PROFILE}',
+     None, True),
+]
+
+
+class QueryCounter:
+    '''
+    Counts the SQL statements run by the current thread on any engine
+    '''
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.local = threading.local()
+        for engine in engines:
+            event.listen(engine, 'after_cursor_execute', self._afterExecute)
+
+    def _afterExecute(self, *args):
+        self.local.count = self.count + 1
+
+    @property
+    def count(self):
+        return getattr(self.local, 'count', 0)
+
+    def reset(self):
+        self.local.count = 0
+
+
+def percentile(values, pct):
+    '''
+    Nearest-rank percentile of a list of values
+    '''
+    values = sorted(values)
+    index = max(0, int(round(pct / 100 * len(values))) - 1)
+    return values[index]
+
+
+def importTime(budget_ms=None):
+    '''
+    Measures the cold-start import time of wsgi.py with
+    `python -X importtime` in a fresh interpreter, along with the ten
+    slowest top-level imports
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=here, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        universal_newlines=True
+    )
+
+    # lines look like "import time:  self [us] | cumulative | package"
+    topLevel = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not name.startswith(' ' * 2):
+            topLevel.append((name.strip(), int(cumulative_us)))
+
+    total_ms = sum(us for name, us in topLevel) / 1000
+    slowest = sorted(topLevel, key=lambda module: module[1], reverse=True)
+    return {
+        'total_ms': round(total_ms, 2),
+        'budget_ms': budget_ms,
+        'within_budget': budget_ms is None or total_ms <= budget_ms,
+        'slowest': [{'module': name, 'cumulative_ms': round(us / 1000, 2)}
+                    for name, us in slowest[:10]],
+    }
+
+
+def seed(app, scale, processes):
+    '''
+    Tops the database up through the MockData bulk loader to `scale`
+    requests and contacts, so that repeated runs benchmark the same
+    amount of data. Soft-deleted requests are left out of every read,
+    so they are neither counted nor seeded
+    '''
+    from app import dbConn, mockData
+    from app.models import db
+
+    targets = [('admin', 3), ('request', scale), ('image', 20),
+               ('layout', 30), ('contact', scale)]
+    with app.app_context():
+        started = time.perf_counter()
+        for table, target in targets:
+            missing = target - dbConn.count(table)
+            if missing > 0:
+                mockData.bulkLoad(
+                    db, table, missing, processes=processes,
+                    fast_hash=True,
+                    fields={'is_deleted': False}
+                    if table == 'request' else None
+                )
+        if not dbConn.getAdmin(username=BENCH_ADMIN_USERNAME):
+            dbConn.setAdmin(BENCH_ADMIN_USERNAME, BENCH_ADMIN_PASSWORD,
+                            'Bench', 'Admin')
+        return time.perf_counter() - started
+
+
+def saveProfile(app):
+    '''
+    Profiles the index page as the benchmark admin and keeps the profile
+    as BENCH_PROFILE for the admin_profiles_filename route to download
+    '''
+    response = newClient(app, True).get('/?profile')
+    url = response.headers.get('X-Profile-File')
+    if url:
+        directory = app.config['PROFILER_OUTPUT_DIR']
+        os.replace(f'{directory}/{os.path.basename(url)}',
+                   f'{directory}/{BENCH_PROFILE}')
+
+
+def newClient(app, login):
+    '''
+    Creates a test client, logged in as the benchmark admin if needed
+    '''
+    from app import dbConn
+
+    client = app.test_client()
+    if login:
+        with app.app_context():
+            admin = dbConn.getAdmin(username=BENCH_ADMIN_USERNAME)
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin.id)
+            session['_fresh'] = True
+    return client
+
+
+def runScenario(app, counter, scenario, iterations, concurrency):
+    '''
+    Drives a single route with `concurrency` threads until `iterations`
+    requests have been made and returns its statistics
+    '''
+    name, method, url, data, login = scenario
+    clients = threading.local()
+    latencies = []
+    queries = []
+    sizes = []
+    errors = []
+
+    def hit(i):
+        if not hasattr(clients, 'client'):
+            clients.client = newClient(app, login)
+        counter.reset()
+        started = time.perf_counter()
+        kwargs = data() if callable(data) else {'data': data}
+        response = clients.client.open(url, method=method, **kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        sizes.append(len(response.get_data()))
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(hit, range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(scenario, elapsed, latencies, queries, sizes, errors)
+
+
+def runHttpScenario(baseUrl, scenario, iterations, concurrency):
+    '''
+    Drives a single route of an already running server over HTTP, with
+    one persistent connection per thread. Used to compare the front end
+    (nginx and gunicorn) configurations, so query counts are unknown
+    '''
+    from http.client import HTTPConnection
+    from urllib.parse import urlparse
+
+    name, method, url, data, login = scenario
+    host = urlparse(baseUrl).netloc
+    connections = threading.local()
+    latencies = []
+    sizes = []
+    errors = []
+
+    def hit(i):
+        if not hasattr(connections, 'connection'):
+            connections.connection = HTTPConnection(host, timeout=30)
+        started = time.perf_counter()
+        connections.connection.request(method, url)
+        response = connections.connection.getresponse()
+        body = response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(body))
+        if response.status >= 400:
+            errors.append(response.status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(hit, range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(scenario, elapsed, latencies, None, sizes, errors)
+
+
+def openIdleConnections(baseUrl, count):
+    '''
+    Opens `count` keep-alive connections that each make one request and
+    then sit idle, as browsers between page views do. Returns the open
+    connections and the number that could not be opened
+    '''
+    from http.client import HTTPConnection
+    from urllib.parse import urlparse
+
+    host = urlparse(baseUrl).netloc
+
+    def connect(i):
+        connection = HTTPConnection(host, timeout=30)
+        try:
+            connection.request('GET', '/healthz')
+            connection.getresponse().read()
+            return connection
+        except OSError:
+            connection.close()
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(count, 100) or 1) as executor:
+        connections = list(executor.map(connect, range(count)))
+    opened = [connection for connection in connections if connection]
+    return opened, count - len(opened)
+
+
+def summarize(scenario, elapsed, latencies, queries, sizes, errors):
+    '''
+    Builds the JSON report of a single route
+    '''
+    name, method, url, data, login = scenario
+    iterations = len(latencies)
+    return {
+        'route': name,
+        'method': method,
+        'url': url,
+        'requests': iterations,
+        'errors': len(errors),
+        'throughput_rps': round(iterations / elapsed, 2),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p90': round(percentile(latencies, 90), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+        },
+        'queries_per_request':
+            round(statistics.mean(queries), 2) if queries else None,
+        'response_bytes': round(statistics.mean(sizes)),
+    }
+
+
+def writeReport(report, path=None):
+    '''
+    Writes the JSON report to a file, or prints it if no file is given
+    '''
+    output = json.dumps(report, indent=4)
+    if path:
+        with open(path, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the public and admin routes')
+    parser.add_argument('--scale', type=int, default=10000,
+                        help='number of requests and contacts to seed')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='processes generating fake rows when seeding')
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='benchmark against the data already present')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='requests made against each route')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='threads driving each route')
+    parser.add_argument('--routes', nargs='*',
+                        help='only benchmark the named routes')
+    parser.add_argument('--url',
+                        help='benchmark the public GET routes of a running '
+                             'server, e.g. http://localhost, instead of an '
+                             'in-process app')
+    parser.add_argument('--idle-connections', type=int, default=0,
+                        help='with --url, keep this many idle keep-alive '
+                             'connections open during the run')
+    parser.add_argument('--import-budget-ms', type=float,
+                        help='fail if importing wsgi.py takes longer')
+    parser.add_argument('--output', help='file to write the JSON report to')
+    args = parser.parse_args()
+
+    if args.url:
+        report = {'url': args.url, 'iterations': args.iterations,
+                  'concurrency': args.concurrency, 'routes': []}
+        idle, failed = openIdleConnections(args.url, args.idle_connections)
+        report['idle_connections'] = {'opened': len(idle), 'failed': failed}
+        for scenario in SCENARIOS:
+            name, method, url, data, login = scenario
+            if method != 'GET' or login or \
+                    (args.routes and name not in args.routes):
+                continue
+            report['routes'].append(runHttpScenario(
+                args.url, scenario, args.iterations, args.concurrency
+            ))
+        for connection in idle:
+            connection.close()
+        writeReport(report, args.output)
+        return
+
+    coldStart = importTime(args.import_budget_ms)
+
+    from app import create_app
+    from app.models import db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    # the benchmark exits as soon as it is done, so it must never claim
+    # queued submissions or scheduled jobs
+    app.config['BACKGROUND_THREADS'] = False
+    app.config['LOG_TO_STDOUT'] = False
+    app.config['LOG_TO_FILE'] = False
+
+    report = {'scale': args.scale, 'iterations': args.iterations,
+              'concurrency': args.concurrency, 'cold_start': coldStart,
+              'routes': []}
+
+    if not args.skip_seed:
+        seconds = seed(app, args.scale, args.processes)
+        report['seed_seconds'] = round(seconds, 2)
+    saveProfile(app)
+
+    with app.app_context():
+        counter = QueryCounter([db.get_engine(app)] + [
+            db.get_engine(app, bind=bind)
+            for bind in app.config['SQLALCHEMY_REPLICA_BINDS']
+        ])
+
+    for scenario in SCENARIOS:
+        if args.routes and scenario[0] not in args.routes:
+            continue
+        report['routes'].append(runScenario(
+            app, counter, scenario, args.iterations, args.concurrency
+        ))
+
+    writeReport(report, args.output)
+
+    if not coldStart['within_budget']:
+        sys.exit(f"Importing wsgi.py took {coldStart['total_ms']}ms, over "
+                 f'the {args.import_budget_ms}ms budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,23 @@ class ConfigBase:
         f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}'
         f'@db:5432/{POSTGRES_DB}'
         )
+    # gevent workers run many requests at once, which all share this pool
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(environ.get('DB_POOL_MAX_OVERFLOW', 20)),
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+    }
+
+    # Read Replica Config
+    SQLALCHEMY_REPLICA_URIS = [
+        uri for uri in environ.get('DB_REPLICA_URIS', '').split(',') if uri
+    ]
+    SQLALCHEMY_BINDS = {
+        f'replica_{i}': uri for i, uri in enumerate(SQLALCHEMY_REPLICA_URIS)
+    }
+    SQLALCHEMY_REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+    DB_REPLICA_STICKY_SECONDS = 5
 
     # AWS Config
     AWS_ACCESS_KEY_ID = environ['AWS_ACCESS_KEY_ID']
@@ -40,6 +57,9 @@ class ConfigBase:
     AWS_PROJECT_BUCKET = environ['AWS_PROJECT_BUCKET']
     AWS_PROJECT_BUCKET_IMAGE_DIR = environ['AWS_PROJECT_BUCKET_IMAGE_DIR']
     AWS_LOCAL_IMAGE_PATH = environ['AWS_LOCAL_IMAGE_PATH']
+    # 'local' serves downloaded copies, 's3' serves signed or CDN urls
+    IMAGE_SERVING = environ.get('IMAGE_SERVING', 'local')
+    AWS_IMAGE_URL_EXPIRY = 3600
 
     # Other Config
     ADMIN_FORM_SECRET_CODE = environ['ADMIN_FORM_SECRET_CODE']
@@ -55,10 +75,60 @@ class ConfigDev:
     DB_CREATE_ADMIN_USER = True
     LOG_TO_STDOUT = True
     LOG_TO_FILE = False
+    LOG_COMPRESS = True
 
     # SQLAlchemy Config
     SQLALCHEMY_ECHO = False
 
+    # Template Config
+    TEMPLATES_AUTO_RELOAD = True
+    TEMPLATE_BYTECODE_CACHE = False
+    TEMPLATE_BYTECODE_CACHE_DIR = '/tmp/prosperwooddesigns/templates'
+
+    # Unit of Work Config
+    DB_UNIT_OF_WORK = True
+
+    # Archive Config
+    ARCHIVE_AFTER_DAYS = 180
+
+    # Rollup Config
+    ROLLUPS_ENABLED = True
+
+    # Query Debugger Config
+    DB_QUERY_DEBUG = True
+    DB_SLOW_QUERY_MS = 100
+    DB_QUERY_BUDGET_DEFAULT = 10
+    DB_QUERY_BUDGET = {
+        'index': 1,
+        'designs': 1,
+        'admin': 5,
+        'data': 1,
+        'data_rows': 3,
+    }
+
+    # Profiler Config
+    PROFILER_ENABLED = True
+    PROFILER_OUTPUT_DIR = '/prosperwooddesigns/profiles'
+
+    # Intake Queue Config
+    INTAKE_QUEUE_ENABLED = True
+    INTAKE_QUEUE_PATH = '/prosperwooddesigns/queue/intake.sqlite3'
+    INTAKE_QUEUE_BATCH_SIZE = 100
+    INTAKE_QUEUE_INTERVAL = 1
+
+    # Scheduler Config
+    SCHEDULER_ENABLED = True
+    SCHEDULER_HISTORY_DAYS = 30
+
+    # Background Thread Config
+    BACKGROUND_THREADS = True
+
+    # Freezer Config
+    FREEZE_ENABLED = False
+    FREEZE_DIR = '/prosperwooddesigns/frozen'
+    FREEZE_ENDPOINTS = ['index', 'designs', 'about', 'request_success',
+                        'contact_success']
+
     # AWS Config
     AWS_DOWNLOAD_IMAGES = False
 
@@ -73,9 +143,53 @@ class ConfigProd:
     DB_CREATE_ADMIN_USER = False
     LOG_TO_STDOUT = False
     LOG_TO_FILE = True
+    LOG_COMPRESS = True
 
     # SQLAlchemy Config
     SQLALCHEMY_ECHO = False
 
+    # Template Config
+    TEMPLATES_AUTO_RELOAD = False
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_BYTECODE_CACHE_DIR = '/tmp/prosperwooddesigns/templates'
+
+    # Unit of Work Config
+    DB_UNIT_OF_WORK = True
+
+    # Archive Config
+    ARCHIVE_AFTER_DAYS = 180
+
+    # Rollup Config
+    ROLLUPS_ENABLED = True
+
+    # Query Debugger Config
+    DB_QUERY_DEBUG = False
+    DB_SLOW_QUERY_MS = 100
+    DB_QUERY_BUDGET_DEFAULT = None
+    DB_QUERY_BUDGET = {}
+
+    # Profiler Config
+    PROFILER_ENABLED = True
+    PROFILER_OUTPUT_DIR = '/prosperwooddesigns/profiles'
+
+    # Intake Queue Config
+    INTAKE_QUEUE_ENABLED = True
+    INTAKE_QUEUE_PATH = '/prosperwooddesigns/queue/intake.sqlite3'
+    INTAKE_QUEUE_BATCH_SIZE = 100
+    INTAKE_QUEUE_INTERVAL = 1
+
+    # Scheduler Config
+    SCHEDULER_ENABLED = True
+    SCHEDULER_HISTORY_DAYS = 30
+
+    # Background Thread Config
+    BACKGROUND_THREADS = True
+
+    # Freezer Config
+    FREEZE_ENABLED = True
+    FREEZE_DIR = '/prosperwooddesigns/frozen'
+    FREEZE_ENDPOINTS = ['index', 'designs', 'about', 'request_success',
+                        'contact_success']
+
     # AWS Config
     AWS_DOWNLOAD_IMAGES = True
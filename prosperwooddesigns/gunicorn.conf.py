@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+# Michael Cole
+#
+# Gunicorn settings for the production server
+# -------------------------------------------
+#
+# GUNICORN_WORKER_CLASS picks the serving mode:
+#
+#   gevent      every request runs in a greenlet, so waits on Postgres,
+#               S3 and idle keep-alive connections overlap rather than
+#               holding a worker. Each worker serves up to
+#               GUNICORN_WORKER_CONNECTIONS connections at once
+#   gthread     each worker serves GUNICORN_THREADS requests at once
+
+from os import environ
+
+bind = '0.0.0.0:5000'
+worker_class = environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(environ.get('GUNICORN_WORKERS', 1))
+threads = int(environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+# longer than nginx's upstream keepalive_timeout (60s), so nginx closes first
+keepalive = 75
+
+
+def post_fork(server, worker):
+    '''
+    Makes psycopg2 yield to other greenlets while waiting on Postgres
+    instead of blocking the whole worker
+    '''
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+        server.log.info(f'Worker {worker.pid} patched psycopg2 for gevent')
@@ -0,0 +1,81 @@
+# conftest.py
+# Michael Cole
+#
+# Shared pytest fixtures for the app's tests
+# ------------------------------------------
+#
+# Run from inside the development app container so that Postgres is
+# reachable:
+#
+#   docker-compose exec flask python -m pytest
+
+import os
+
+import pytest
+
+from app import create_app, dbConn
+from app.models import DailyRollup, db
+
+
+@pytest.fixture(scope='session')
+def app():
+    '''
+    Development app in testing mode, so routes that go over their query
+    budget raise QueryBudgetExceeded. Unless replicas are configured,
+    the primary doubles as a read replica so that reads are routed
+    through a replica engine
+    '''
+    if not os.environ.get('DB_REPLICA_URIS'):
+        os.environ['DB_REPLICA_URIS'] = (
+            f"postgresql://{os.environ['POSTGRES_USER']}:"
+            f"{os.environ['POSTGRES_PASSWORD']}@db:5432/"
+            f"{os.environ['POSTGRES_DB']}"
+        )
+    app = create_app()
+    app.testing = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['LOG_TO_STDOUT'] = False
+    app.config['LOG_TO_FILE'] = False
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def adminClient(app):
+    '''
+    Test client logged in as the generic development admin user
+    '''
+    with app.app_context():
+        admin = dbConn.getAdmin(username=app.config['DB_TEST_ADMIN_USERNAME'])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def cleanup(app):
+    '''
+    List of idempotency keys whose requests and contacts are deleted,
+    along with their rollup counts, after the test
+    '''
+    keys = []
+    yield keys
+    with app.app_context():
+        db.session.rollback()
+        for table in ('request', 'contact'):
+            model = dbConn.getModel(table)
+            rows = model.query.filter(model.idempotency_key.in_(keys))
+            for row in rows:
+                dbConn.rollups.increment(row.created_date, table,
+                                         'created', count=-1)
+                dbConn.rollups.increment(row.created_date, table, 'status',
+                                         row.status, count=-1)
+                db.session.delete(row)
+        DailyRollup.query.filter_by(count=0).delete()
+        db.session.commit()
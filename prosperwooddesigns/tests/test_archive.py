@@ -0,0 +1,129 @@
+# test_archive.py
+# Michael Cole
+#
+# Tests for soft-deleted requests and the archive tables
+# ------------------------------------------------------
+
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import dbConn
+from app.extensions import clock
+from app.models import (Contact, ContactArchive, DailyRollup, Request,
+                        RequestArchive, db)
+
+OLD = date(2001, 1, 1)
+RECENT = date(2001, 5, 20)
+
+
+@pytest.fixture
+def frozen(app):
+    '''
+    App context with the clock frozen in 2001, long before any fake data,
+    whose rows, archived rows and rollups are deleted afterwards
+    '''
+    clock.freeze(datetime(2001, 6, 1, 18, tzinfo=timezone.utc))
+    with app.app_context():
+        yield
+        clock.unfreeze()
+        db.session.rollback()
+        for model in (Request, Contact, RequestArchive, ContactArchive):
+            model.query.filter(model.created_date < date(2002, 1, 1)) \
+                .delete(synchronize_session=False)
+        DailyRollup.query.filter(DailyRollup.day < date(2002, 1, 1)) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+def getWord():
+    '''
+    Returns a unique word of letters only, which full-text search keeps
+    as a single token
+    '''
+    return 'soft' + uuid.uuid4().hex.translate(
+        str.maketrans('0123456789', 'ghijklmnop'))
+
+
+def setRequest(name, **kwargs):
+    return dbConn.setRequest('archive@example.com', '', name, 'email',
+                             f'An archive test request about {name}.',
+                             **kwargs)
+
+
+def test_deleted_requests_left_out(frozen):
+    name = getWord()
+    live = setRequest(name)
+    deleted = setRequest(name, is_deleted=True)
+
+    assert dbConn.getRequest(id=deleted.id) is None
+    assert dbConn.getRequest(id=deleted.id, include_deleted=True) is deleted
+    assert deleted not in dbConn.getRequests()
+    assert deleted in dbConn.getRequests(include_deleted=True)
+
+    assert dbConn.count('request', name=name) == 1
+    assert dbConn.count('request', include_deleted=True, name=name) == 2
+    assert not dbConn.exists('request', offset=1, name=name)
+    assert dbConn.exists('request', offset=1, include_deleted=True,
+                         name=name)
+
+    total, rows = dbConn.getPage('request', search=name)
+    assert (total, [row['id'] for row in rows]) == (1, [live.id])
+    total, rows = dbConn.getPage('request', search=name,
+                                 include_deleted=True)
+    assert total == 2
+
+    total, rows = dbConn.search('request', name)
+    assert (total, [row['id'] for row in rows]) == (1, [live.id])
+    total, rows = dbConn.search('request', name, include_deleted=True)
+    assert total == 2
+
+    keys = [column.key for column in dbConn.getColumns('request')]
+    ids = {row[keys.index('id')] for row in dbConn.streamRows('request')}
+    assert live.id in ids and deleted.id not in ids
+    ids = {row[keys.index('id')]
+           for row in dbConn.streamRows('request', include_deleted=True)}
+    assert deleted.id in ids
+
+
+def test_archive(frozen):
+    name = getWord()
+    complete = setRequest(name, status='complete', created_date=OLD)
+    deleted = setRequest(name, is_deleted=True, created_date=OLD)
+    unread = setRequest(name, created_date=OLD)
+    recent = setRequest(name, status='complete', created_date=RECENT)
+    read = dbConn.setContact('archive@example.com', name, 'Read.',
+                             status='read', created_date=OLD)
+    contact = dbConn.setContact('archive@example.com', name, 'Unread.',
+                                created_date=OLD)
+    ids = [row.id for row in (complete, deleted, unread, recent, read,
+                              contact)]
+    completeId, deletedId, unreadId, recentId, readId, contactId = ids
+
+    # only rows created more than 90 days before 1 June 2001 are moved
+    assert dbConn.archive(days=90) == (2, 1)
+    db.session.expire_all()
+
+    assert {row.id for row in Request.query.filter_by(name=name)} == \
+        {unreadId, recentId}
+    archived = {row.id: row
+                for row in RequestArchive.query.filter_by(name=name)}
+    assert set(archived) == {completeId, deletedId}
+    assert archived[deletedId].is_deleted
+    assert archived[completeId].status == 'complete'
+    assert {row.id for row in Contact.query.filter_by(name=name)} == \
+        {contactId}
+    assert [row.id for row in ContactArchive.query.filter_by(name=name)] \
+        == [readId]
+
+    assert dbConn.archive(days=90) == (0, 0)
+
+
+def test_deleted_request_not_updated(frozen, adminClient):
+    deleted = setRequest(getWord(), is_deleted=True)
+    response = adminClient.post(f'/admin/request/{deleted.id}',
+                                data={f'request-{deleted.id}': 'read'})
+    assert response.status_code == 404
+    db.session.refresh(deleted)
+    assert deleted.status == 'unread'
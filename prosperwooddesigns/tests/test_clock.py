@@ -0,0 +1,47 @@
+# test_clock.py
+# Michael Cole
+#
+# Tests for the app clock and the greeting computed from it
+# ---------------------------------------------------------
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.extensions import Clock, Helper
+
+
+def test_freeze():
+    clock = Clock()
+    clock.freeze(datetime(2020, 1, 1, 15, tzinfo=timezone.utc))
+    assert clock.now().hour == 9
+    assert clock.now('UTC').hour == 15
+    assert clock.now().tzinfo is Clock.getZone('America/Chicago')
+
+
+def test_unfreeze():
+    clock = Clock()
+    clock.freeze(datetime(2020, 1, 1, tzinfo=timezone.utc))
+    clock.unfreeze()
+    assert clock.now().year > 2020
+
+
+def test_date_parts():
+    assert Clock.getDateParts(date(2020, 8, 1)) == ('2020', '08', '01')
+
+
+@pytest.mark.parametrize('hour, greeting', [
+    (4, 'Good Morning'),
+    (11, 'Good Morning'),
+    (12, 'Good Afternoon'),
+    (16, 'Good Afternoon'),
+    (17, 'Good Evening'),
+    (23, 'Good Evening'),
+    (0, 'It is very late'),
+    (3, 'It is very late'),
+])
+def test_greeting(hour, greeting):
+    clock = Clock()
+    # Chicago is six hours behind UTC in January
+    clock.freeze(datetime(2020, 1, 1, (hour + 6) % 24, tzinfo=timezone.utc))
+    assert Helper(clock=clock).getGreeting() == greeting
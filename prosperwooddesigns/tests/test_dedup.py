@@ -0,0 +1,113 @@
+# test_dedup.py
+# Michael Cole
+#
+# Tests for idempotent form submission with dedup keys
+# ----------------------------------------------------
+
+import importlib
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import dbConn
+from app.extensions import DedupCache
+from app.models import Contact, Request, db
+
+REQUEST_FORM = {
+    'email': 'dedup@example.com',
+    'phone': '555-555-5555',
+    'name': 'Dedup Test',
+    'contact_method': 'email',
+    'description': 'A test request with a long enough description.',
+}
+
+CONTACT_FORM = {
+    'name': 'Dedup Test',
+    'email': 'dedup@example.com',
+    'content': 'A test question with a long enough description.',
+}
+
+
+def test_cache_get_and_add():
+    cache = DedupCache()
+    assert cache.get('key') is None
+    cache.add('key', 42)
+    assert cache.get('key') == 42
+
+
+def test_cache_evicts_least_recently_used():
+    cache = DedupCache(maxsize=2)
+    cache.add('a')
+    cache.add('b')
+    cache.get('a')
+    cache.add('c')
+    assert cache.get('b') is None
+    assert cache.get('a') is True
+    assert cache.get('c') is True
+
+
+@pytest.mark.parametrize('url, form, model', [
+    ('/requestform', REQUEST_FORM, Request),
+    ('/contact', CONTACT_FORM, Contact),
+])
+def test_resubmission_stored_once(app, client, cleanup, url, form, model):
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+    for _ in range(2):
+        response = client.post(url, data=dict(form, idempotency_key=key))
+        assert response.status_code == 302
+    with app.app_context():
+        assert model.query.filter_by(idempotency_key=key).count() == 1
+
+
+@pytest.mark.parametrize('url, form, model', [
+    ('/requestform', REQUEST_FORM, Request),
+    ('/contact', CONTACT_FORM, Contact),
+])
+def test_resubmission_to_another_worker(app, client, cleanup, monkeypatch,
+                                        url, form, model):
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+    client.post(url, data=dict(form, idempotency_key=key))
+    # another worker has not seen the key, so the unique column catches it
+    routes = importlib.import_module('app.routes')
+    monkeypatch.setattr(routes, 'dedupCache', DedupCache())
+    response = client.post(url, data=dict(form, idempotency_key=key))
+    assert response.status_code == 302
+    with app.app_context():
+        assert model.query.filter_by(idempotency_key=key).count() == 1
+
+
+@pytest.mark.parametrize('url, form, model', [
+    ('/requestform', REQUEST_FORM, Request),
+    ('/contact', CONTACT_FORM, Contact),
+])
+def test_retry_after_failed_commit(app, client, cleanup, monkeypatch,
+                                   url, form, model):
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+
+    def fail():
+        raise OperationalError('COMMIT', {}, Exception('connection lost'))
+
+    monkeypatch.setattr(db.session, 'commit', fail)
+    with pytest.raises(OperationalError):
+        client.post(url, data=dict(form, idempotency_key=key))
+    monkeypatch.undo()
+
+    # the key was never remembered, so the retry is stored
+    response = client.post(url, data=dict(form, idempotency_key=key))
+    assert response.status_code == 302
+    with app.app_context():
+        assert model.query.filter_by(idempotency_key=key).count() == 1
+
+
+def test_admin_lookup_misses_not_remembered(app):
+    username = f'dedup-{uuid.uuid4().hex[:8]}'
+    with app.test_request_context():
+        assert dbConn.getAdmin(username=username) is None
+        admin = dbConn.setAdmin(username, 'password', 'Dedup', 'Test',
+                                commit=False)
+        assert dbConn.getAdmin(username=username) is admin
+        db.session.rollback()
@@ -0,0 +1,62 @@
+# test_exports.py
+# Michael Cole
+#
+# Tests for the streaming CSV and NDJSON table exports
+# ----------------------------------------------------
+
+import csv
+import io
+import json
+
+import pytest
+
+from app import dbConn
+from app.extensions import Exporter
+
+
+def test_csv_chunks(app):
+    with app.app_context():
+        total = dbConn.count('request')
+        chunks = list(Exporter().export('request', 'csv', batch_size=2))
+    # one chunk per two rows, and one for the header and any rest
+    assert len(chunks) == total // 2 + 1
+    rows = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert rows[0] == [column.key
+                       for column in dbConn.getColumns('request')]
+    assert len(rows) == total + 1
+
+
+def test_ndjson_rows(app):
+    with app.app_context():
+        total = dbConn.count('contact')
+        chunks = list(Exporter().export('contact', 'ndjson', batch_size=3))
+    assert len(chunks) == -(-total // 3)
+    rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+    assert len(rows) == total
+    assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+    assert 'search_vector' not in rows[0]
+
+
+@pytest.mark.parametrize('format', ['csv', 'ndjson'])
+def test_admin_passwords_left_out(adminClient, format):
+    response = adminClient.get(f'/admin/data/admin.{format}')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == \
+        f'attachment; filename=admin.{format}'
+    body = response.get_data(as_text=True)
+    assert 'password' not in body
+    assert '$2b$' not in body
+
+
+@pytest.mark.parametrize('url', [
+    '/admin/data/job_run.csv',
+    '/admin/data/request.xml',
+])
+def test_unknown_exports(adminClient, url):
+    assert adminClient.get(url).status_code == 404
+
+
+def test_export_requires_log_in(client):
+    response = client.get('/admin/data/request.csv')
+    assert response.status_code == 302
+    assert '/admin/log-in' in response.headers['Location']
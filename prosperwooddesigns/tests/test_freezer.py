@@ -0,0 +1,67 @@
+# test_freezer.py
+# Michael Cole
+#
+# Tests for the pre-rendered public pages
+# ---------------------------------------
+
+import os
+import threading
+
+import pytest
+
+from app.extensions import Freezer
+
+
+@pytest.fixture
+def freezer(app, tmp_path, monkeypatch):
+    '''
+    Freezer writing to a temporary directory. It is not set up with
+    init_app, so it never re-freezes on commits, and rendering fails the
+    test if it would trigger the first-request hooks
+    '''
+    def triggered():
+        raise AssertionError('first-request hooks triggered')
+
+    monkeypatch.setattr(app, 'try_trigger_before_first_request_functions',
+                        triggered)
+    monkeypatch.setitem(app.config, 'IMAGE_SERVING', 'local')
+    freezer = Freezer()
+    freezer.app = app
+    freezer.directory = str(tmp_path)
+    freezer.endpoints = ['index', 'designs', 'missing']
+    with app.app_context():
+        yield freezer
+
+
+def test_freeze(freezer, tmp_path):
+    assert freezer.freeze() == 2
+    assert sorted(os.listdir(tmp_path)) == [
+        '.fingerprint', 'designs.html', 'designs.html.gz', 'index.html',
+        'index.html.gz']
+    assert b'<html' in (tmp_path / 'index.html').read_bytes()
+
+
+def test_freeze_if_changed(freezer, tmp_path):
+    assert freezer.freeze(ifChanged=True) == 2
+    (tmp_path / 'index.html').unlink()
+    assert freezer.freeze(ifChanged=True) == 0
+    assert not (tmp_path / 'index.html').exists()
+    assert freezer.freeze() == 2
+
+
+def test_no_refreeze_outside_serving_worker(freezer, monkeypatch):
+    started = []
+    monkeypatch.setattr(threading.Thread, 'start',
+                        lambda thread: started.append(thread))
+
+    class Session:
+        info = {'freeze': True}
+
+    freezer.afterCommit(Session())
+    assert started == []
+    assert Session.info == {}
+
+    freezer.serving = True
+    Session.info['freeze'] = True
+    freezer.afterCommit(Session())
+    assert len(started) == 1
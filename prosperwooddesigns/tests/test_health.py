@@ -0,0 +1,28 @@
+# test_health.py
+# Michael Cole
+#
+# Tests for the liveness and readiness checks
+# -------------------------------------------
+
+
+def test_healthz(client):
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'alive', 'startup': 'started'}
+
+
+def test_readyz_checks_images_each_time(app, client, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'IMAGE_SERVING', 'local')
+    monkeypatch.setitem(app.config, 'AWS_DOWNLOAD_IMAGES', True)
+    monkeypatch.setitem(app.config, 'AWS_LOCAL_IMAGE_PATH', str(tmp_path))
+
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['checks'] == {
+        'started': True, 'images': False, 'db': True}
+
+    # images synced by another process are seen without a restart
+    (tmp_path / 'cabinet00.jpeg').write_bytes(b'')
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
@@ -0,0 +1,126 @@
+# test_intake.py
+# Michael Cole
+#
+# Tests for the JSON intake endpoints and their background queue
+# ---------------------------------------------------------------
+
+import time
+import uuid
+
+import pytest
+from flask import Flask
+
+from app.extensions import IntakeQueue
+from app.models import Contact, Request
+
+
+def getRequest(key, name='Intake Test'):
+    return {
+        'emailaddress': 'intake@example.com',
+        'phonenumber': '555-555-5555',
+        'name': name,
+        'contactmethod': 'email',
+        'description': 'A queued test request with a long description.',
+        'idempotency_key': key,
+    }
+
+
+@pytest.fixture
+def queue(app, tmp_path):
+    '''
+    Queue in a temporary file whose committer is driven by the test. It is
+    set up on an app of its own, which never serves a request, so that
+    its committer thread never starts
+    '''
+    queueApp = Flask(__name__)
+    queueApp.config.update(app.config)
+    queueApp.config['INTAKE_QUEUE_PATH'] = str(tmp_path / 'intake.sqlite3')
+    queue = IntakeQueue()
+    queue.init_app(queueApp)
+    with app.app_context():
+        yield queue
+
+
+@pytest.mark.parametrize('url, field, data', [
+    ('/api/requestform', 'name', {'name': 'x' * 81}),
+    ('/api/requestform', 'phone', {'phone': '5' * 81}),
+    ('/api/requestform', 'email', {'email': f"{'x' * 60}@example.com"}),
+    ('/api/contact', 'name', {'name': 'x' * 81}),
+    ('/api/contact', 'email', {'email': f"{'x' * 60}@example.com"}),
+])
+def test_api_rejects_overlong_fields(client, url, field, data):
+    submission = {
+        'name': 'Intake Test',
+        'email': 'intake@example.com',
+        'phone': '555-555-5555',
+        'contact_method': 'email',
+        'description': 'A queued test request with a long description.',
+        'content': 'A queued test question with a long description.',
+    }
+    response = client.post(url, json=dict(submission, **data))
+    assert response.status_code == 400
+    assert field in response.get_json()['errors']
+
+
+def test_api_submission_committed(app, client, cleanup):
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+    submission = {
+        'name': 'Intake Test',
+        'email': 'intake@example.com',
+        'content': 'A queued test question with a long description.',
+        'idempotency_key': key,
+    }
+    first = client.post('/api/contact', json=submission)
+    second = client.post('/api/contact', json=submission)
+    assert first.status_code == second.status_code == 202
+    assert first.get_json() == second.get_json()
+
+    # the app's committer checks the queue every INTAKE_QUEUE_INTERVAL
+    with app.app_context():
+        for _ in range(50):
+            if Contact.query.filter_by(idempotency_key=key).count():
+                break
+            time.sleep(0.1)
+        assert Contact.query.filter_by(idempotency_key=key).count() == 1
+
+
+def test_commit_batch(queue, cleanup):
+    keys = [uuid.uuid4().hex for _ in range(3)]
+    cleanup.extend(keys)
+    for key in keys:
+        queue.put('request', getRequest(key))
+    assert queue.commit() == 3
+    assert queue.commit() == 0
+    assert Request.query.filter(
+        Request.idempotency_key.in_(keys)).count() == 3
+
+
+def test_commit_skips_duplicates(queue, cleanup):
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+    queue.put('request', getRequest(key))
+    queue.put('request', getRequest(key))
+    assert queue.commit() == 2
+    assert Request.query.filter_by(idempotency_key=key).count() == 1
+    assert queue.getDeadSubmissions() == []
+
+
+def test_rejected_submission_dead_lettered(queue, cleanup):
+    good, bad, later = (uuid.uuid4().hex for _ in range(3))
+    cleanup.extend([good, bad, later])
+    queue.put('request', getRequest(good))
+    badId = queue.put('request', getRequest(bad, name='x' * 81))
+    queue.put('request', getRequest(later))
+
+    assert queue.commit() == 3
+    stored = {request.idempotency_key for request in Request.query.filter(
+        Request.idempotency_key.in_([good, bad, later]))}
+    assert stored == {good, later}
+
+    [(id, kind, payload, error)] = queue.getDeadSubmissions()
+    assert (id, kind, payload['idempotency_key']) == (badId, 'request', bad)
+    assert 'too long' in error
+
+    # nothing is left behind to be claimed again
+    assert queue.commit() == 0
@@ -0,0 +1,127 @@
+# test_logs.py
+# Michael Cole
+#
+# Tests for compressed log rotation and the indexed log reader
+# ------------------------------------------------------------
+
+import fcntl
+import gzip
+import os
+from datetime import date
+
+import pytest
+
+from app.extensions import LogArchive
+
+DAY = date(2020, 8, 1)
+NEXT_DAY = date(2020, 8, 2)
+LINES = [
+    '>> [08:00:00] Created request 1\n',
+    '>> [08:30:00] Serving index page\n',
+    '>> [14:00:00] Created contact 2\n',
+    'continued on a second line\n',
+]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    os.makedirs(os.path.dirname(archive.getPath(DAY)))
+    return archive
+
+
+def write(path, lines):
+    with open(path, 'a') as f:
+        f.writelines(lines)
+
+
+def readAll(archive):
+    '''
+    Decompresses the whole compressed log, members that are not indexed
+    included
+    '''
+    with gzip.open(archive.getPath(DAY, 'log.gz'), 'rt') as f:
+        return f.readlines()
+
+
+def test_rotate(archive):
+    write(archive.getPath(DAY), LINES)
+    assert archive.rotate(before=DAY) == 0
+    assert archive.rotate(before=NEXT_DAY) == 1
+    assert not os.path.exists(archive.getPath(DAY))
+    assert archive.getCounts(DAY, DAY) == {
+        DAY: {'Created': 2, 'Serving': 1}}
+    assert list(archive.readDay(DAY)) == LINES
+    assert readAll(archive) == LINES
+
+
+def test_read_filters(archive):
+    write(archive.getPath(DAY), LINES)
+    archive.compress(DAY)
+    assert list(archive.readDay(DAY, since=12)) == LINES[2:]
+    assert list(archive.readDay(DAY, type='Created')) == \
+        [LINES[0]] + LINES[2:]
+    assert list(archive.readDay(DAY, type='Deleted')) == []
+    assert list(archive.readDay(DAY, match='index')) == [LINES[1]]
+    assert list(archive.read(date(2020, 7, 31), NEXT_DAY,
+                             until=8)) == LINES[:2]
+
+
+def test_append_after_compress(archive):
+    write(archive.getPath(DAY), LINES[:2])
+    archive.compress(DAY)
+    write(archive.getPath(DAY), LINES[2:])
+    # lines written since are read before being compressed as well
+    assert list(archive.readDay(DAY)) == LINES
+    archive.compress(DAY)
+    assert list(archive.readDay(DAY)) == LINES
+    assert archive.readIndex(DAY)['lines'] == len(LINES)
+
+
+def test_orphaned_claim(archive):
+    write(f'{archive.getPath(DAY)}.rotating', LINES)
+    assert list(archive.readDay(DAY)) == LINES
+    assert archive.rotate(before=NEXT_DAY) == 1
+    assert not os.path.exists(f'{archive.getPath(DAY)}.rotating')
+    assert list(archive.readDay(DAY)) == LINES
+
+
+def test_live_claim(archive):
+    claimed = f'{archive.getPath(DAY)}.rotating'
+    write(claimed, LINES)
+    with open(claimed) as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        assert not archive.compress(DAY)
+    assert os.path.exists(claimed)
+
+
+def test_died_before_removing_claim(archive):
+    path = archive.getPath(DAY)
+    write(path, LINES)
+    # a process claims and appends the file, then dies before removing it
+    source = archive.lock(path)
+    os.rename(path, f'{path}.rotating')
+    archive.append(DAY, source)
+    source.close()
+
+    assert list(archive.readDay(DAY)) == LINES
+    assert archive.rotate(before=NEXT_DAY) == 1
+    assert not os.path.exists(f'{path}.rotating')
+    assert list(archive.readDay(DAY)) == LINES
+    assert readAll(archive) == LINES
+    assert archive.readIndex(DAY)['lines'] == len(LINES)
+
+
+def test_died_before_indexing(archive):
+    path = archive.getPath(DAY)
+    write(path, LINES[:2])
+    archive.compress(DAY)
+    # a process claims the rest and writes a member, then dies before
+    # updating the index
+    write(f'{path}.rotating', LINES[2:])
+    with open(archive.getPath(DAY, 'log.gz'), 'ab') as f:
+        f.write(gzip.compress(''.join(LINES[2:]).encode()))
+
+    assert archive.rotate(before=NEXT_DAY) == 1
+    assert list(archive.readDay(DAY)) == LINES
+    assert readAll(archive) == LINES
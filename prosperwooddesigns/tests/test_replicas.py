@@ -0,0 +1,90 @@
+# test_replicas.py
+# Michael Cole
+#
+# Tests for read replica routing in RoutingSession
+# ------------------------------------------------
+
+import time
+import uuid
+
+from flask import session
+
+from app import queryDebugger
+from app.models import Admin, Request, db
+
+
+def getReplica(app):
+    return db.get_engine(app, bind=app.config['SQLALCHEMY_REPLICA_BINDS'][0])
+
+
+def newAdmin():
+    return Admin(f'replica-{uuid.uuid4().hex[:8]}', 'password', 'Replica',
+                 'Test', created_date=None)
+
+
+def test_reads_go_to_replica(app):
+    with app.test_request_context():
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is getReplica(app)
+
+
+def test_writes_go_to_primary(app):
+    with app.test_request_context():
+        statement = Request.__table__.update().values(status='read')
+        assert db.session.get_bind(clause=statement) is db.engine
+
+
+def test_reads_after_flush_go_to_primary(app):
+    with app.app_context():
+        db.session.add(newAdmin())
+        db.session.flush()
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is db.engine
+        db.session.rollback()
+
+
+def test_wrote_resets_when_transaction_ends(app):
+    # a long-lived app context, like the intake committer's thread
+    with app.app_context():
+        db.session.add(newAdmin())
+        db.session.flush()
+        db.session.rollback()
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is getReplica(app)
+
+        admin = newAdmin()
+        db.session.add(admin)
+        db.session.flush()
+        db.session.delete(admin)
+        db.session.commit()
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is getReplica(app)
+
+
+def test_savepoint_keeps_wrote(app):
+    with app.app_context():
+        db.session.add(newAdmin())
+        db.session.flush()
+        with db.session.begin_nested():
+            pass
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is db.engine
+        db.session.rollback()
+
+
+def test_reads_after_commit_stick_to_primary(app):
+    with app.test_request_context():
+        session['dbWroteAt'] = time.time()
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is db.engine
+        session['dbWroteAt'] = time.time() - \
+            app.config['DB_REPLICA_STICKY_SECONDS']
+        assert db.session.get_bind(clause=Request.query.statement) \
+            is getReplica(app)
+
+
+def test_explain_runs_on_replica(app):
+    with app.app_context():
+        replica = getReplica(app)
+        plan = queryDebugger.explain('SELECT id FROM request', {}, replica)
+        assert plan and 'Scan' in plan[0]
@@ -0,0 +1,128 @@
+# test_rollups.py
+# Michael Cole
+#
+# Tests for the dashboard rollups and the dates they are kept by
+# --------------------------------------------------------------
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app import dbConn, mockData
+from app.extensions import Rollups, clock
+from app.models import Contact, DailyRollup, Request, db
+
+TODAY = date(2001, 1, 10)
+
+
+@pytest.fixture
+def frozen(app):
+    '''
+    App context with the clock frozen in 2001, long before any fake data,
+    whose requests and rollups are deleted afterwards
+    '''
+    clock.freeze(datetime(2001, 1, 10, 18, tzinfo=timezone.utc))
+    with app.app_context():
+        yield
+        clock.unfreeze()
+        db.session.rollback()
+        Request.query.filter(Request.created_date < date(2002, 1, 1)) \
+            .delete(synchronize_session=False)
+        DailyRollup.query.filter(DailyRollup.day < date(2002, 1, 1)) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+def getCount(day, table, metric, bucket=''):
+    row = DailyRollup.query.get((day, table, metric, bucket))
+    return row.count if row else 0
+
+
+@pytest.mark.parametrize('histogram, median', [
+    ([], None),
+    ([(3, 0)], None),
+    ([(4, 1)], 4),
+    ([(9, 1), (1, 1), (5, 1)], 5),
+    ([(2, 3), (10, 1)], 2),
+    ([(1, 1), (2, 1)], 1),
+])
+def test_median(histogram, median):
+    assert Rollups().median(histogram) == median
+
+
+def test_created_and_completed(frozen):
+    request = dbConn.setRequest('rollup@example.com', '', 'Rollup Test',
+                                'email', 'A rollup test request.',
+                                created_date=date(2001, 1, 1))
+    assert request.created_date == date(2001, 1, 1)
+    dbConn.updateRequest(request.id, status='complete')
+
+    assert getCount(date(2001, 1, 1), 'request', 'created') == 1
+    assert getCount(date(2001, 1, 1), 'request', 'status', 'unread') == 1
+    assert getCount(TODAY, 'request', 'status', 'complete') == 1
+    assert getCount(TODAY, 'request', 'completion_days', '9') == 1
+
+    dashboard = dbConn.rollups.getDashboard('request', weeks=2)
+    assert dashboard['per_week'][0] == {'week': '2001-01-01', 'count': 1}
+    assert dashboard['median_completion_days'] == 9
+
+
+def test_created_date_defaults_to_clock(frozen):
+    request = dbConn.setRequest('rollup@example.com', '', 'Rollup Test',
+                                'email', 'A rollup test request.')
+    assert request.created_date == TODAY
+    assert getCount(TODAY, 'request', 'created') == 1
+
+    layout = dbConn.setLayout('/test', 'test', 'Test', False, commit=False)
+    assert layout.created_date == TODAY
+    layout = dbConn.setLayout('/test', 'test', 'Test', False,
+                              created_date=date(2001, 1, 1), commit=False)
+    assert layout.created_date == date(2001, 1, 1)
+    db.session.rollback()
+
+
+def test_fake_date_defaults_to_clock():
+    clock.freeze(datetime(2020, 2, 1, 18, tzinfo=timezone.utc))
+    try:
+        fakeDates = [mockData.fakeDate() for _ in range(50)]
+    finally:
+        clock.unfreeze()
+    assert date(2020, 1, 1) <= min(fakeDates)
+    assert max(fakeDates) <= date(2020, 2, 1)
+
+
+def test_bulk_load_records_rollups(app):
+    from sqlalchemy import func
+
+    with app.app_context():
+        highest = db.session.query(func.max(Contact.id)).scalar() or 0
+        before = dict(db.session.query(
+            DailyRollup.day, DailyRollup.count
+        ).filter_by(table='contact', metric='created'))
+        try:
+            mockData.bulkLoad(db, 'contact', 20, batch_size=8)
+            contacts = Contact.query.filter(Contact.id > highest).all()
+            assert len(contacts) == 20
+            for contact in contacts:
+                expected = before.get(contact.created_date, 0) + sum(
+                    1 for other in contacts
+                    if other.created_date == contact.created_date
+                )
+                assert getCount(contact.created_date, 'contact',
+                                'created') == expected
+        finally:
+            db.session.rollback()
+            for contact in Contact.query.filter(Contact.id > highest):
+                dbConn.rollups.increment(contact.created_date, 'contact',
+                                         'created', count=-1)
+                dbConn.rollups.increment(contact.created_date, 'contact',
+                                         'status', contact.status,
+                                         count=-1)
+                db.session.delete(contact)
+            DailyRollup.query.filter_by(count=0).delete()
+            db.session.commit()
+
+
+def test_fake_batch_fields():
+    rows = mockData.fakeBatch('request', 0, 20, fields={'is_deleted': False})
+    assert [row['is_deleted'] for row in rows] == [False] * 20
@@ -0,0 +1,58 @@
+# test_routes.py
+# Michael Cole
+#
+# Query budget tests for the public and admin routes
+# --------------------------------------------------
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import QueryBudgetExceeded
+from app.models import db
+
+
+@pytest.mark.parametrize('url', [
+    '/',
+    '/designs',
+    '/requestform',
+    '/contact',
+])
+def test_public_route_within_budget(client, url):
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', [
+    '/admin',
+    '/admin/data',
+    '/admin/data/request/rows?limit=10&offset=0',
+    '/admin/data/contact/rows?limit=10&offset=0',
+    '/admin/data/request/rows?limit=10&offset=0&search=wood',
+])
+def test_admin_route_within_budget(adminClient, url):
+    assert adminClient.get(url).status_code == 200
+
+
+def test_over_budget_raises(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'DB_QUERY_BUDGET', {'designs': -1})
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/designs')
+
+
+def test_replica_queries_count(app, adminClient, monkeypatch):
+    bind = app.config['SQLALCHEMY_REPLICA_BINDS'][0]
+    replica = db.get_engine(app, bind=bind)
+    replicaQueries = []
+
+    def countQuery(conn, cursor, statement, *args):
+        replicaQueries.append(statement)
+
+    event.listen(replica, 'after_cursor_execute', countQuery)
+    monkeypatch.setitem(app.config, 'DB_QUERY_BUDGET', {'data_rows': 0})
+    try:
+        # the rows are only read, so their queries go to the replica
+        with pytest.raises(QueryBudgetExceeded) as exceeded:
+            adminClient.get('/admin/data/request/rows')
+    finally:
+        event.remove(replica, 'after_cursor_execute', countQuery)
+    assert replicaQueries
+    assert f'ran {len(replicaQueries)} queries' in str(exceeded.value)
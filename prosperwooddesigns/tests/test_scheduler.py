@@ -0,0 +1,137 @@
+# test_scheduler.py
+# Michael Cole
+#
+# Tests for cron schedules and the cross-worker job scheduler
+# -----------------------------------------------------------
+
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.extensions import CronSchedule, Scheduler, clock
+from app.models import JobRun, db
+
+
+def test_ranges_and_steps():
+    schedule = CronSchedule('*/15 9-17 * * 1-5')
+    # 3 August 2020 was a Monday
+    assert schedule.matches(datetime(2020, 8, 3, 9, 30))
+    assert not schedule.matches(datetime(2020, 8, 3, 9, 10))
+    assert not schedule.matches(datetime(2020, 8, 3, 18, 0))
+    assert not schedule.matches(datetime(2020, 8, 1, 9, 30))
+
+
+def test_lists():
+    schedule = CronSchedule('0,30 3 * * *')
+    assert schedule.matches(datetime(2020, 8, 1, 3, 30))
+    assert not schedule.matches(datetime(2020, 8, 1, 3, 15))
+
+
+def test_sunday_as_seven():
+    assert CronSchedule('0 0 * * 7').fields == \
+        CronSchedule('0 0 * * 0').fields
+    assert CronSchedule('0 0 * * 7').matches(datetime(2020, 8, 2))
+
+
+def test_day_of_month_or_day_of_week():
+    schedule = CronSchedule('0 0 1 * 1')
+    assert schedule.matches(datetime(2020, 8, 1))
+    assert schedule.matches(datetime(2020, 8, 3))
+    assert not schedule.matches(datetime(2020, 8, 4))
+
+
+def test_single_day_field():
+    assert not CronSchedule('0 0 1 * *').matches(datetime(2020, 8, 3))
+    assert not CronSchedule('0 0 * * 1').matches(datetime(2020, 8, 1))
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *',
+    '60 * * * *',
+    '0 24 * * *',
+    '0 0 0 * *',
+    '0 0 * * 8',
+    '0 0 * * 5-1',
+])
+def test_invalid(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.fixture
+def job(app):
+    '''
+    Scheduler with a single job that records its calls, and the job's
+    name. The job's runs are deleted afterwards
+    '''
+    scheduler = Scheduler()
+    name = f'test-{uuid.uuid4().hex[:8]}'
+    calls = []
+    scheduler.job(name, '* * * * *')(lambda: calls.append(name))
+    with app.app_context():
+        yield scheduler, name, calls
+        db.session.rollback()
+        JobRun.query.filter_by(name=name).delete()
+        db.session.commit()
+
+
+def getMinute():
+    return clock.now().replace(second=0, microsecond=0)
+
+
+def test_run_job_once_per_minute(job):
+    scheduler, name, calls = job
+    minute = getMinute()
+    runId = scheduler.runJob(name, minute)
+    assert runId is not None
+    assert scheduler.runJob(name, minute) is None
+    assert calls == [name]
+    run = JobRun.query.get(runId)
+    assert run.status == 'success'
+    assert run.finished_at is not None
+
+    assert scheduler.runJob(name, minute + timedelta(minutes=1)) is not None
+    assert len(calls) == 2
+
+
+def test_run_job_skipped_while_locked(job):
+    scheduler, name, calls = job
+    key = zlib.crc32(f'job:{name}:'.encode())
+    with db.engine.connect() as lock:
+        lock.execute(text('SELECT pg_advisory_lock(:key)'), key=key)
+        try:
+            assert scheduler.runJob(name, getMinute()) is None
+        finally:
+            lock.execute(text('SELECT pg_advisory_unlock(:key)'), key=key)
+    assert calls == []
+    assert scheduler.runJob(name, getMinute()) is not None
+
+
+def test_failed_job_recorded(job):
+    scheduler, name, calls = job
+
+    def fail():
+        raise RuntimeError('job failed')
+
+    scheduler.jobs[name] = (CronSchedule('* * * * *'), fail, 'cluster')
+    run = JobRun.query.get(scheduler.runJob(name, getMinute()))
+    assert run.status == 'failed'
+    assert 'RuntimeError: job failed' in run.error
+
+
+def test_abandoned_runs_marked(job):
+    scheduler, name, calls = job
+    minute = getMinute()
+    db.session.add(JobRun(name=name, host='', status='running',
+                          scheduled_for=minute - timedelta(minutes=1),
+                          started_at=minute - timedelta(minutes=1),
+                          worker='dead-worker'))
+    db.session.commit()
+    scheduler.runJob(name, minute)
+    statuses = {run.scheduled_for: run.status
+                for run in JobRun.query.filter_by(name=name)}
+    assert statuses == {minute - timedelta(minutes=1): 'abandoned',
+                        minute: 'success'}
@@ -0,0 +1,86 @@
+# test_search.py
+# Michael Cole
+#
+# Tests for full-text search over requests and contacts
+# -----------------------------------------------------
+
+import uuid
+
+import pytest
+
+from app import dbConn
+
+
+def getWord():
+    '''
+    Returns a unique word of letters only, which full-text search keeps
+    as a single token
+    '''
+    return 'find' + uuid.uuid4().hex.translate(
+        str.maketrans('0123456789', 'ghijklmnop'))
+
+
+@pytest.fixture
+def word(app, cleanup):
+    '''
+    Unique word and a function adding requests with it to the database.
+    The requests are deleted afterwards
+    '''
+    word = getWord()
+
+    def setRequest(name, description):
+        key = uuid.uuid4().hex
+        cleanup.append(key)
+        return dbConn.setRequest('search@example.com', '', name, 'email',
+                                 description, idempotency_key=key).id
+
+    with app.app_context():
+        yield word, setRequest
+
+
+def getIds(table, text):
+    total, rows = dbConn.search(table, text)
+    assert total == len(rows)
+    return [row['id'] for row in rows]
+
+
+def test_best_matches_first(word):
+    word, setRequest = word
+    once = setRequest('Search Test', f'A cabinet of {word}.')
+    twice = setRequest(f'{word} Test', f'A table of {word}.')
+    assert getIds('request', word) == [twice, once]
+
+
+def test_web_search_syntax(word):
+    word, setRequest = word
+    cabinet = setRequest('Search Test', f'A walnut cabinet, {word}.')
+    table = setRequest('Search Test', f'A cherry table, {word}.')
+    assert getIds('request', f'{word} -walnut') == [table]
+    assert getIds('request', f'"walnut cabinet" {word}') == [cabinet]
+    assert sorted(getIds('request', f'{word} walnut or cherry')) == \
+        sorted([cabinet, table])
+    # words are stemmed, so plurals match
+    assert getIds('request', f'{word} cabinets') == [cabinet]
+
+
+def test_search_route(adminClient, word, cleanup):
+    word, setRequest = word
+    id = setRequest('Search Test', f'A request about {word}.')
+    response = adminClient.get(f'/admin/search?table=request&q={word}')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['total'] == 1
+    [row] = result['rows']
+    assert row['id'] == id
+    assert row['rank'] > 0
+    assert 'search_vector' not in row
+
+    key = uuid.uuid4().hex
+    cleanup.append(key)
+    dbConn.setContact('search@example.com', 'Search Test',
+                      f'A question about {word}.', idempotency_key=key)
+    response = adminClient.get(f'/admin/search?table=contact&q={word}')
+    assert response.get_json()['total'] == 1
+
+    assert adminClient.get('/admin/search?table=admin&q=x') \
+        .status_code == 404